@@ -1,100 +1,195 @@
 from __future__ import annotations
 
-from datetime import datetime
-from typing import Dict
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Iterable, List, Optional, Tuple
+
+from .models import DisclosureScope, Presentation, RiskInsight, utcnow
+
+
+Indicators = Tuple[Tuple[str, float], ...]
+
+# ICD-10 category prefixes (first three characters) flagged as high risk.
+_ICD_HIGH_RISK = frozenset({"K29"})
+
+# Medical-record / research model
+RECORD_BASELINE = 0.32
+ICD_HIGH_RISK_WEIGHT = 0.28
+ICD_OTHER_WEIGHT = -0.12
+RECENCY_MAX_WINDOW = 45
+RECENCY_MIN_WINDOW = 7
+RECENCY_DEFAULT_WINDOW = 21
+RECENCY_SCALE = 90.0
+ORG_SIGNAL_MOD = 13
+
+# Medication-pickup model
+PICKUP_BASELINE = 0.5
+PICKUP_OFFSET = -0.2
+MED_CODE_MOD = 11
+DAYS_SUPPLY_SCALE = 60.0
+PICKUP_WINDOW_DAYS = 14
+
+SCORE_CEILING = 0.99
+
+
+def _round_score(score: float) -> float:
+    """Round a clipped, non-negative score half-up to three decimals."""
+    return int(score * 1000.0 + 0.5) / 1000.0
+
+
+def _parse_iso_date(value: str, fallback: Optional[date]) -> Optional[date]:
+    """Parse an ISO date/datetime, returning ``fallback`` for malformed input.
+
+    Every string ``fromisoformat`` accepts starts with a year digit, so empty
+    or non-digit-led input is rejected up front without raising ValueError.
+    """
+    if not value or not value[0].isdigit():
+        return fallback
+    try:
+        return datetime.fromisoformat(value).date()
+    except ValueError:
+        return fallback
+
+
+@lru_cache(maxsize=1024)
+def _char_sum(value: str) -> int:
+    """Sum of code points, summed over the ASCII bytes when possible."""
+    try:
+        return sum(value.encode("ascii"))
+    except UnicodeEncodeError:
+        return sum(ord(c) for c in value)
+
+
+@lru_cache(maxsize=4096)
+def _medical_record_signals(
+    condition_code: Optional[str],
+    recorded_date: Optional[str],
+    managing_org: Optional[str],
+    today: date,
+) -> Tuple[float, int, Indicators]:
+    """Score a medical-record disclosure; ``today`` keys the cache per day."""
+    indicators: Indicators = ()
+
+    if condition_code and condition_code[:3] in _ICD_HIGH_RISK:
+        icd_flag = ICD_HIGH_RISK_WEIGHT
+        indicators += (("icd_flag", icd_flag),)
+    elif condition_code:
+        icd_flag = ICD_OTHER_WEIGHT
+        indicators += (("icd_flag", icd_flag),)
+    else:
+        icd_flag = 0.0
+
+    if recorded_date:
+        visit_date = _parse_iso_date(recorded_date, today)
+        days_since_visit = max(today.toordinal() - visit_date.toordinal(), 0)
+        window = max(RECENCY_MAX_WINDOW - days_since_visit, RECENCY_MIN_WINDOW)
+    else:
+        window = RECENCY_DEFAULT_WINDOW
+    recency_window = window / RECENCY_SCALE
+    indicators += (("recency_window", recency_window),)
+
+    org_signal = 0.0
+    if managing_org:
+        org_signal = (_char_sum(managing_org) % ORG_SIGNAL_MOD) / 100
+        indicators += (("org_signal", org_signal),)
+
+    score = RECORD_BASELINE + icd_flag + recency_window + org_signal
+    score = max(0.0, min(score, SCORE_CEILING))
+    return _round_score(score), int(window), indicators
+
+
+@lru_cache(maxsize=4096)
+def _medication_pickup_signals(
+    medication_code: Optional[str],
+    days_supply_raw: Optional[str],
+    pickup_deadline: Optional[str],
+    today: date,
+) -> Tuple[float, Indicators]:
+    """Score a medication-pickup disclosure; ``today`` keys the cache per day."""
+    indicators: Indicators = ()
+
+    med_code_hash = 0.0
+    if medication_code:
+        med_code_hash = (_char_sum(medication_code) % MED_CODE_MOD) / 100
+        indicators += (("med_code_hash", med_code_hash),)
+
+    days_supply = 0
+    if days_supply_raw:
+        try:
+            days_supply = int(days_supply_raw)
+        except ValueError:
+            days_supply = 0
+    supply_signal = 0.0
+    if days_supply:
+        supply_signal = min(days_supply / DAYS_SUPPLY_SCALE, 1.0)
+        indicators += (("days_supply", supply_signal),)
+
+    pickup_urgency = 0.0
+    if pickup_deadline:
+        deadline = _parse_iso_date(pickup_deadline, None)
+        # The deadline starts at midnight, so part of today has already elapsed.
+        days_left = (
+            deadline.toordinal() - today.toordinal() - 1 if deadline is not None else 0
+        )
+        pickup_urgency = max(0, min(1, (PICKUP_WINDOW_DAYS - days_left) / PICKUP_WINDOW_DAYS))
+        indicators += (("pickup_urgency", pickup_urgency),)
 
-from .models import DisclosureScope, Presentation, RiskInsight
+    score = PICKUP_BASELINE + med_code_hash + supply_signal + pickup_urgency + PICKUP_OFFSET
+    score = max(0.0, min(score, SCORE_CEILING))
+    return _round_score(score), indicators
 
 
 class InsightEngine:
     """Deterministic analytics for demo purposes."""
 
-    def evaluate(self, presentation: Presentation) -> RiskInsight:
+    def evaluate(self, presentation: Presentation, today: Optional[date] = None) -> RiskInsight:
+        today = today or utcnow().date()
         if presentation.scope in {DisclosureScope.MEDICAL_RECORD, DisclosureScope.RESEARCH_ANALYTICS}:
-            return self._medical_record_insight(presentation)
-        return self._medication_pickup_insight(presentation)
-
-    def _medical_record_insight(self, presentation: Presentation) -> RiskInsight:
-        condition_code = presentation.disclosed_fields.get("condition.code.coding[0].code")
-        recorded_date = presentation.disclosed_fields.get("condition.recordedDate")
-        managing_org = presentation.disclosed_fields.get("managing_organization.value")
-
-        baseline = 0.32
-        modifiers: Dict[str, float] = {}
-
-        if condition_code and condition_code.startswith("K29"):
-            modifiers["icd_flag"] = 0.28
-        elif condition_code:
-            modifiers["icd_flag"] = -0.12
-
-        if recorded_date:
-            try:
-                visit_dt = datetime.fromisoformat(recorded_date)
-            except ValueError:
-                visit_dt = datetime.utcnow()
-            days_since_visit = max((datetime.utcnow() - visit_dt).days, 0)
-            window = max(45 - days_since_visit, 7)
-        else:
-            window = 21
-        modifiers["recency_window"] = window / 90.0
-
-        if managing_org:
-            modifiers["org_signal"] = (sum(ord(c) for c in managing_org) % 13) / 100
-
-        score = baseline + sum(modifiers.values())
-        score = max(0.0, min(score, 0.99))
-
+            return self._medical_record_insight(presentation, today)
+        return self._medication_pickup_insight(presentation, today)
+
+    def evaluate_batch(self, presentations: Iterable[Presentation]) -> List[RiskInsight]:
+        """Evaluate many presentations against a single reference day.
+
+        Repeated disclosures within the batch are served from the scoring
+        caches, so bulk analytics only pays for distinct field combinations.
+        """
+        today = utcnow().date()
+        return [self.evaluate(presentation, today) for presentation in presentations]
+
+    def _medical_record_insight(self, presentation: Presentation, today: date) -> RiskInsight:
+        fields = presentation.disclosed_fields
+        score, window, indicators = _medical_record_signals(
+            fields.get("condition.code.coding[0].code"),
+            fields.get("condition.recordedDate"),
+            fields.get("managing_organization.value"),
+            today,
+        )
         return RiskInsight(
             scope=DisclosureScope.MEDICAL_RECORD,
-            gastritis_risk_score=round(score, 3),
-            trend_window_days=int(window),
-            supporting_indicators=modifiers,
+            gastritis_risk_score=score,
+            trend_window_days=window,
+            supporting_indicators=dict(indicators),
         )
 
-    def _medication_pickup_insight(self, presentation: Presentation) -> RiskInsight:
-        medication_code = presentation.disclosed_fields.get(
-            "medication_dispense[0].medicationCodeableConcept.coding[0].code"
-        )
-        days_supply_raw = presentation.disclosed_fields.get(
-            "medication_dispense[0].days_supply"
+    def _medication_pickup_insight(self, presentation: Presentation, today: date) -> RiskInsight:
+        fields = presentation.disclosed_fields
+        score, indicators = _medication_pickup_signals(
+            fields.get("medication_dispense[0].medicationCodeableConcept.coding[0].code"),
+            fields.get("medication_dispense[0].days_supply"),
+            fields.get("medication_dispense[0].pickup_window_end"),
+            today,
         )
-        pickup_deadline = presentation.disclosed_fields.get(
-            "medication_dispense[0].pickup_window_end"
-        )
-
-        modifiers: Dict[str, float] = {}
-        baseline = 0.5
-
-        if medication_code:
-            modifiers["med_code_hash"] = (sum(ord(c) for c in medication_code) % 11) / 100
-
-        days_supply = 0
-        if days_supply_raw:
-            try:
-                days_supply = int(days_supply_raw)
-            except ValueError:
-                days_supply = 0
-        if days_supply:
-            modifiers["days_supply"] = min(days_supply / 60.0, 1.0)
-
-        if pickup_deadline:
-            try:
-                deadline_dt = datetime.fromisoformat(pickup_deadline)
-            except ValueError:
-                deadline_dt = datetime.utcnow()
-            days_left = (deadline_dt - datetime.utcnow()).days
-            modifiers["pickup_urgency"] = max(0, min(1, (14 - days_left) / 14.0))
-
-        score = baseline + sum(modifiers.values()) - 0.2
-        score = max(0.0, min(score, 0.99))
-
         return RiskInsight(
             scope=DisclosureScope.MEDICATION_PICKUP,
-            gastritis_risk_score=round(score, 3),
-            trend_window_days=14,
-            supporting_indicators=modifiers,
+            gastritis_risk_score=score,
+            trend_window_days=PICKUP_WINDOW_DAYS,
+            supporting_indicators=dict(indicators),
         )
 
 
+_ENGINE = InsightEngine()
+
+
 def get_risk_engine() -> InsightEngine:
-    return InsightEngine()
+    return _ENGINE
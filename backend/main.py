@@ -1,13 +1,20 @@
 from __future__ import annotations
 
+import asyncio
 import base64
+import hmac
 import io
 import json
+import logging
 import os
-import secrets
+import re
+import time
 import uuid
+from collections import deque
 from datetime import date, datetime, timedelta
-from typing import Any, Dict, List, Optional, Tuple, Union
+from functools import lru_cache
+from operator import attrgetter, itemgetter
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
 from fastapi import (
     APIRouter,
@@ -19,8 +26,9 @@ from fastapi import (
     Query,
 )
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from pydantic import BaseModel, Field, ValidationError
+from fastapi.responses import JSONResponse, ORJSONResponse, Response, StreamingResponse
+from pydantic import BaseModel, ConfigDict, Field, ValidationError
+from starlette.types import ASGIApp, Receive, Scope, Send
 
 from .analytics import get_risk_engine
 from .models import (
@@ -38,10 +46,13 @@ from .models import (
     Presentation,
     ProblemDetail,
     QRCodeResponse,
+    RiskInsight,
     RiskInsightResponse,
     VerificationCodeResponse,
     VerificationResult,
     VerificationSession,
+    describe_ial,
+    utcnow,
 )
 from .store import store
 
@@ -51,21 +62,48 @@ try:  # pragma: no cover - optional dependency for nicer QR codes
 except Exception:  # pragma: no cover - fallback to text payloads
     qrcode = None
 
-app = FastAPI(title="MedSSI Sandbox APIs", version="0.6.0")
+try:  # pragma: no cover - optional dependency for faster JSON encoding
+    import orjson
+except Exception:  # pragma: no cover - fallback to the stdlib encoder
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+app = FastAPI(
+    title="MedSSI Sandbox APIs",
+    version="0.6.0",
+    default_response_class=ORJSONResponse if orjson is not None else JSONResponse,
+)
 allowed_origins_env = os.getenv(
     "MEDSSI_ALLOWED_ORIGINS",
     "http://localhost:5173,http://127.0.0.1:5173,http://localhost:4173",
 )
 ALLOWED_ORIGINS = [origin.strip() for origin in allowed_origins_env.split(",") if origin.strip()]
 
+
+class OriginSetCORSMiddleware(CORSMiddleware):
+    """CORSMiddleware that checks request origins against a frozenset."""
+
+    def __init__(self, app: ASGIApp, **options: Any) -> None:
+        super().__init__(app, **options)
+        self.allow_origins = frozenset(self.allow_origins)
+
+
 app.add_middleware(
-    CORSMiddleware,
+    OriginSetCORSMiddleware,
     allow_origins=ALLOWED_ORIGINS or ["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
     expose_headers=["*"],
 )
+# Handler convention: endpoints that only do lock-free store lookups (single
+# ``get`` calls) are ``async def`` and run on the event loop. Anything that
+# takes a store lock (writes, listings, forget/purge/reset) stays ``def``:
+# the background cleanup thread holds those locks while it works, and waiting
+# on them from the event loop would stall every in-flight request. Endpoints
+# that render QR codes, build payloads or verify presentations are ``def`` too,
+# so Starlette runs their CPU work in the threadpool.
 api_v2 = APIRouter(prefix="/v2", tags=["MedSSI v2"])
 
 
@@ -79,81 +117,248 @@ WALLET_ACCESS_TOKEN = os.getenv("MEDSSI_WALLET_TOKEN", "wallet-sandbox-token")
 DEFAULT_ISSUER_ID = os.getenv(
     "MEDSSI_DEFAULT_ISSUER_ID", "did:example:moda-issuer"
 )
+CLEANUP_INTERVAL_SECONDS = float(os.getenv("MEDSSI_CLEANUP_INTERVAL", "5"))
+
+
+def _problem(*, status: int, type_: str, title: str, detail: str) -> Dict[str, Any]:
+    """Build a ProblemDetail body once so fixed errors can be raised without a model."""
+    return ProblemDetail(type=type_, title=title, status=status, detail=detail).model_dump()
+
+
+# Static ProblemDetail fields keyed by error kind; only ``detail`` varies per raise.
+_PROBLEMS: Dict[str, Dict[str, Any]] = {
+    "policy_empty": {
+        "type": "https://medssi.dev/errors/policy-empty",
+        "title": "Disclosure policies required",
+        "status": 400,
+    },
+    "policy_duplicate": {
+        "type": "https://medssi.dev/errors/policy-duplicate",
+        "title": "Duplicate disclosure scope",
+        "status": 400,
+    },
+    "policy_fields_empty": {
+        "type": "https://medssi.dev/errors/policy-fields-empty",
+        "title": "Disclosure fields required",
+        "status": 400,
+    },
+    "disclosure_invalid": {
+        "type": "https://medssi.dev/errors/disclosure-invalid",
+        "title": "Field outside of disclosure policy",
+        "status": 400,
+    },
+    "credential_not_found": {
+        "type": "https://medssi.dev/errors/credential-not-found",
+        "title": "Credential not found",
+        "status": 404,
+    },
+    "credential_revoked": {
+        "type": "https://medssi.dev/errors/credential-revoked",
+        "title": "Credential revoked",
+        "status": 400,
+    },
+    "credential_not_issued": {
+        "type": "https://medssi.dev/errors/credential-not-issued",
+        "title": "Credential not issued",
+        "status": 400,
+    },
+    "missing_holder": {
+        "type": "https://medssi.dev/errors/missing-holder",
+        "title": "Holder DID required",
+        "status": 400,
+    },
+    "missing_payload": {
+        "type": "https://medssi.dev/errors/missing-payload",
+        "title": "Payload required",
+        "status": 400,
+    },
+    "unsupported_action": {
+        "type": "https://medssi.dev/errors/unsupported-action",
+        "title": "Unsupported action",
+        "status": 400,
+    },
+    "transaction_id": {
+        "type": "https://medssi.dev/errors/transaction-id",
+        "title": "transactionId invalid",
+        "status": 400,
+    },
+    "transaction_not_found": {
+        "type": "https://medssi.dev/errors/transaction-not-found",
+        "title": "Transaction not found",
+        "status": 404,
+    },
+    "offer_expired": {
+        "type": "https://medssi.dev/errors/offer-expired",
+        "title": "Credential offer expired",
+        "status": 410,
+    },
+    "fields_required": {
+        "type": "https://medssi.dev/errors/fields-required",
+        "title": "At least one field required",
+        "status": 400,
+    },
+    "presentation_not_found": {
+        "type": "https://medssi.dev/errors/presentation-not-found",
+        "title": "Presentation not found",
+        "status": 404,
+    },
+    "value_mismatch": {
+        "type": "https://medssi.dev/errors/value-mismatch",
+        "title": "Disclosed value mismatch",
+        "status": 400,
+    },
+}
+
 
+def _raise(kind: str, detail: str) -> None:
+    problem = _PROBLEMS[kind]
+    raise HTTPException(status_code=problem["status"], detail={**problem, "detail": detail})
 
-def _raise_problem(*, status: int, type_: str, title: str, detail: str) -> None:
-    raise HTTPException(
-        status_code=status,
-        detail=ProblemDetail(type=type_, title=title, status=status, detail=detail).dict(),
+
+_TOKEN_AUDIENCES = ("issuer", "verifier", "wallet")
+
+_PROBLEM_TOKEN_MISSING = {
+    audience: _problem(
+        status=401,
+        type_="https://medssi.dev/errors/missing-token",
+        title=f"{audience.capitalize()} token required",
+        detail=f"Provide Bearer token for {audience} access.",
+    )
+    for audience in _TOKEN_AUDIENCES
+}
+_PROBLEM_TOKEN_REJECTED = {
+    audience: _problem(
+        status=403,
+        type_="https://medssi.dev/errors/token-rejected",
+        title="Access token rejected",
+        detail=f"The supplied token is not valid for {audience} operations.",
     )
+    for audience in _TOKEN_AUDIENCES
+}
+_PROBLEM_TOKEN_FORMAT = _problem(
+    status=401,
+    type_="https://medssi.dev/errors/invalid-token-format",
+    title="Bearer token format required",
+    detail="Authorization header must be formatted as 'Bearer <token>'.",
+)
+_PROBLEM_SANDBOX_TOKEN_MISSING = _problem(
+    status=401,
+    type_="https://medssi.dev/errors/missing-token",
+    title="Sandbox token required",
+    detail="Provide issuer, wallet, or verifier token.",
+)
+_PROBLEM_SANDBOX_TOKEN_REJECTED = _problem(
+    status=403,
+    type_="https://medssi.dev/errors/token-rejected",
+    title="Access token rejected",
+    detail="The supplied token is not valid for issuer, wallet, or verifier operations.",
+)
 
 
-def _validate_token(authorization: Optional[str], expected: str, audience: str) -> None:
+def _bearer_token(authorization: str) -> str:
+    if len(authorization) < 8 or authorization[:7].lower() != "bearer ":
+        raise HTTPException(status_code=401, detail=_PROBLEM_TOKEN_FORMAT)
+    return authorization[7:]
+
+
+_ACCESS_TOKEN_BYTES = {
+    "issuer": ISSUER_ACCESS_TOKEN.encode(),
+    "verifier": VERIFIER_ACCESS_TOKEN.encode(),
+    "wallet": WALLET_ACCESS_TOKEN.encode(),
+}
+
+
+@lru_cache(maxsize=32)
+def _validate_token(authorization: Optional[str], audience: str) -> None:
+    # Only successful checks are memoized; lru_cache does not store raised errors.
     if not authorization:
-        _raise_problem(
-            status=401,
-            type_="https://medssi.dev/errors/missing-token",
-            title=f"{audience.capitalize()} token required",
-            detail=f"Provide Bearer token for {audience} access.",
-        )
-    scheme, _, token = authorization.partition(" ")
-    if scheme.lower() != "bearer" or not token:
-        _raise_problem(
-            status=401,
-            type_="https://medssi.dev/errors/invalid-token-format",
-            title="Bearer token format required",
-            detail="Authorization header must be formatted as 'Bearer <token>'.",
-        )
-    if token != expected:
-        _raise_problem(
-            status=403,
-            type_="https://medssi.dev/errors/token-rejected",
-            title="Access token rejected",
-            detail=f"The supplied token is not valid for {audience} operations.",
-        )
+        raise HTTPException(status_code=401, detail=_PROBLEM_TOKEN_MISSING[audience])
+    token = _bearer_token(authorization)
+    if not hmac.compare_digest(token.encode(), _ACCESS_TOKEN_BYTES[audience]):
+        raise HTTPException(status_code=403, detail=_PROBLEM_TOKEN_REJECTED[audience])
 
 
-def require_issuer_token(authorization: Optional[str] = Header(None)) -> None:
-    _validate_token(authorization, ISSUER_ACCESS_TOKEN, "issuer")
+# Token dependencies only do cached string checks, so they run on the event
+# loop instead of taking a threadpool hop before every endpoint.
+async def require_issuer_token(authorization: Optional[str] = Header(None)) -> None:
+    _validate_token(authorization, "issuer")
 
 
-def require_verifier_token(authorization: Optional[str] = Header(None)) -> None:
-    _validate_token(authorization, VERIFIER_ACCESS_TOKEN, "verifier")
+async def require_verifier_token(authorization: Optional[str] = Header(None)) -> None:
+    _validate_token(authorization, "verifier")
 
 
-def require_wallet_token(authorization: Optional[str] = Header(None)) -> None:
-    _validate_token(authorization, WALLET_ACCESS_TOKEN, "wallet")
+async def require_wallet_token(authorization: Optional[str] = Header(None)) -> None:
+    _validate_token(authorization, "wallet")
 
 
-def require_any_sandbox_token(authorization: Optional[str] = Header(None)) -> None:
+_SANDBOX_TOKENS = tuple(_ACCESS_TOKEN_BYTES.values())
+
+
+@lru_cache(maxsize=32)
+def _validate_sandbox_token(authorization: Optional[str]) -> None:
     if authorization is None:
-        _raise_problem(
-            status=401,
-            type_="https://medssi.dev/errors/missing-token",
-            title="Sandbox token required",
-            detail="Provide issuer, wallet, or verifier token.",
-        )
-    try:
-        _validate_token(authorization, ISSUER_ACCESS_TOKEN, "issuer")
-        return
-    except HTTPException:
-        pass
-    try:
-        _validate_token(authorization, VERIFIER_ACCESS_TOKEN, "verifier")
-        return
-    except HTTPException:
-        pass
-    _validate_token(authorization, WALLET_ACCESS_TOKEN, "wallet")
+        raise HTTPException(status_code=401, detail=_PROBLEM_SANDBOX_TOKEN_MISSING)
+    token = _bearer_token(authorization).encode()
+    # Compare against every audience so timing does not reveal which one matched.
+    matched = False
+    for expected in _SANDBOX_TOKENS:
+        matched |= hmac.compare_digest(token, expected)
+    if not matched:
+        raise HTTPException(status_code=403, detail=_PROBLEM_SANDBOX_TOKEN_REJECTED)
+
 
+async def require_any_sandbox_token(authorization: Optional[str] = Header(None)) -> None:
+    _validate_sandbox_token(authorization)
 
-@app.middleware("http")
-async def cleanup_expired_middleware(request, call_next):
-    store.cleanup_expired()
-    response = await call_next(request)
-    return response
 
+def _clear_token_caches() -> None:
+    _validate_token.cache_clear()
+    _validate_sandbox_token.cache_clear()
 
-class IssuanceWithDataRequest(BaseModel):
+
+class CleanupExpiredMiddleware:
+    """Pure ASGI middleware that expires stale offers/sessions between requests.
+
+    Cleanup scans the whole store, so it runs at most once per ``interval``
+    seconds, in a worker thread so the scan never stalls the event loop;
+    endpoints still check ``is_active`` on the records they touch.
+    """
+
+    def __init__(self, app: ASGIApp, interval: float = CLEANUP_INTERVAL_SECONDS) -> None:
+        self.app = app
+        self.interval = interval
+        self._last_cleanup = float("-inf")
+        self._pending: Optional[asyncio.Future] = None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http" and self._pending is None:
+            now = time.monotonic()
+            if now - self._last_cleanup >= self.interval:
+                self._last_cleanup = now
+                self._pending = asyncio.ensure_future(asyncio.to_thread(store.cleanup_expired))
+                self._pending.add_done_callback(self._cleanup_done)
+        await self.app(scope, receive, send)
+
+    def _cleanup_done(self, future: asyncio.Future) -> None:
+        self._pending = None
+        if future.cancelled():
+            return
+        exc = future.exception()
+        if exc is not None:
+            logger.error("Background cleanup of expired records failed", exc_info=exc)
+
+
+app.add_middleware(CleanupExpiredMiddleware)
+
+
+class AliasedModel(BaseModel):
+    """Base for MODA-style camelCase models that also accept field names."""
+
+    model_config = ConfigDict(populate_by_name=True, extra="ignore")
+
+
+class IssuanceWithDataRequest(AliasedModel):
     issuer_id: str = Field(..., alias="issuerId")
     holder_did: Optional[str] = Field(None, alias="holderDid")
     holder_hint: Optional[str] = Field(
@@ -178,11 +383,8 @@ class IssuanceWithDataRequest(BaseModel):
     valid_for_minutes: int = Field(5, ge=1, le=5, alias="validMinutes")
     transaction_id: Optional[str] = Field(None, alias="transactionId")
 
-    class Config:
-        allow_population_by_field_name = True
 
-
-class IssuanceWithoutDataRequest(BaseModel):
+class IssuanceWithoutDataRequest(AliasedModel):
     issuer_id: str = Field(..., alias="issuerId")
     ial: IdentityAssuranceLevel = Field(
         IdentityAssuranceLevel.NHI_CARD_PIN, alias="ial"
@@ -203,9 +405,6 @@ class IssuanceWithoutDataRequest(BaseModel):
         description="Template describing the FHIR structure the holder must supply.",
     )
 
-    class Config:
-        allow_population_by_field_name = True
-
 
 class VerificationSubmission(BaseModel):
     session_id: str
@@ -224,7 +423,7 @@ class MODAIssuanceField(BaseModel):
     content: Optional[str] = ""
 
 
-class MODAIssuanceRequest(BaseModel):
+class MODAIssuanceRequest(AliasedModel):
     vc_uid: str = Field(..., alias="vcUid")
     issuance_date: Optional[date] = Field(None, alias="issuanceDate")
     expired_date: Optional[date] = Field(None, alias="expiredDate")
@@ -235,11 +434,8 @@ class MODAIssuanceRequest(BaseModel):
     valid_minutes: Optional[int] = Field(None, alias="validMinutes")
     ial: Optional[IdentityAssuranceLevel] = Field(None, alias="ial")
 
-    class Config:
-        allow_population_by_field_name = True
 
-
-class GovIssueResponse(BaseModel):
+class GovIssueResponse(AliasedModel):
     transaction_id: str = Field(..., alias="transactionId")
     qr_code: str = Field(..., alias="qrCode")
     qr_payload: str = Field(..., alias="qrPayload")
@@ -250,11 +446,8 @@ class GovIssueResponse(BaseModel):
     ial_description: str = Field(..., alias="ialDescription")
     scope: DisclosureScope = Field(..., alias="scope")
 
-    class Config:
-        allow_population_by_field_name = True
-
 
-class GovCredentialNonceResponse(BaseModel):
+class GovCredentialNonceResponse(AliasedModel):
     transaction_id: str = Field(..., alias="transactionId")
     credential_id: str = Field(..., alias="credentialId")
     credential_status: CredentialStatus = Field(..., alias="credentialStatus")
@@ -269,11 +462,8 @@ class GovCredentialNonceResponse(BaseModel):
     payload: Optional[CredentialPayload] = Field(None, alias="payload")
     credential: str = Field(..., alias="credential")
 
-    class Config:
-        allow_population_by_field_name = True
 
-
-class OIDVPSessionRequest(BaseModel):
+class OIDVPSessionRequest(AliasedModel):
     verifier_id: str = Field(..., alias="verifierId")
     verifier_name: str = Field(..., alias="verifierName")
     purpose: Optional[str] = Field("憑證驗證", alias="purpose")
@@ -284,11 +474,8 @@ class OIDVPSessionRequest(BaseModel):
     transaction_id: Optional[str] = Field(None, alias="transactionId")
     ref: Optional[str] = Field(None, alias="ref")
 
-    class Config:
-        allow_population_by_field_name = True
-
 
-class OIDVPQRCodeResponse(BaseModel):
+class OIDVPQRCodeResponse(AliasedModel):
     transaction_id: str = Field(..., alias="transactionId")
     qrcode_image: str = Field(..., alias="qrcodeImage")
     auth_uri: str = Field(..., alias="authUri")
@@ -297,29 +484,28 @@ class OIDVPQRCodeResponse(BaseModel):
     ial: IdentityAssuranceLevel = Field(..., alias="ial")
     expires_at: datetime = Field(..., alias="expiresAt")
 
-    class Config:
-        allow_population_by_field_name = True
 
-
-class OIDVPResultRequest(BaseModel):
+class OIDVPResultRequest(AliasedModel):
     transaction_id: str = Field(..., alias="transactionId")
 
-    class Config:
-        allow_population_by_field_name = True
-
 
-class OIDVPResultResponse(BaseModel):
+class OIDVPResultResponse(AliasedModel):
     verify_result: bool = Field(..., alias="verifyResult")
     result_description: str = Field(..., alias="resultDescription")
     transaction_id: str = Field(..., alias="transactionId")
     data: List[Dict[str, Any]] = Field(default_factory=list, alias="data")
 
-    class Config:
-        allow_population_by_field_name = True
+
+_QR_PAYLOAD_PREFIXES = {
+    kind: f"medssi://{kind}?token=" for kind in ("credential", "vp-session")
+}
 
 
 def _build_qr_payload(token: str, kind: str) -> str:
-    return f"medssi://{kind}?token={token}"
+    prefix = _QR_PAYLOAD_PREFIXES.get(kind)
+    if prefix is None:
+        return f"medssi://{kind}?token={token}"
+    return prefix + token
 
 
 def _make_qr_data_uri(payload: str) -> str:
@@ -398,8 +584,88 @@ MODA_SCOPE_ALIAS = {
 }
 
 
+def _json_bytes(data: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def _b64url(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+_JWT_HEADER_B64 = _b64url(b'{"typ":"JWT","alg":"ES256"}')
+
+TOKEN_POOL_SIZE = 256
+_token_pools: Dict[int, Deque[str]] = {}
+
+
+def _fill_token_pool(nbytes: int) -> Deque[str]:
+    pool = _token_pools.setdefault(nbytes, deque())
+    raw = os.urandom(nbytes * TOKEN_POOL_SIZE)
+    pool.extend(_b64url(raw[i : i + nbytes]) for i in range(0, len(raw), nbytes))
+    return pool
+
+
+def _urlsafe_token(nbytes: int) -> str:
+    """Equivalent of ``secrets.token_urlsafe(nbytes)`` drawn from a pooled urandom read.
+
+    One ``os.urandom`` call fills TOKEN_POOL_SIZE tokens of the requested size.
+    """
+    pool = _token_pools.get(nbytes) or _fill_token_pool(nbytes)
+    while True:
+        try:
+            return pool.popleft()
+        except IndexError:
+            _fill_token_pool(nbytes)
+
+
+_uuid_pool: Deque[uuid.UUID] = deque()
+
+
+def _uuid4() -> uuid.UUID:
+    """Equivalent of ``uuid.uuid4()`` drawn from a pooled urandom read."""
+    while True:
+        try:
+            return _uuid_pool.popleft()
+        except IndexError:
+            raw = os.urandom(16 * TOKEN_POOL_SIZE)
+            _uuid_pool.extend(
+                uuid.UUID(bytes=raw[i : i + 16], version=4) for i in range(0, len(raw), 16)
+            )
+
+
+_hex_id_pool: Deque[str] = deque()
+
+
+def _hex_id() -> str:
+    """Equivalent of ``secrets.token_hex(16)`` drawn from a pooled urandom read.
+
+    Used for opaque record ids, where building a UUID object only to take
+    ``.hex`` is wasted work.
+    """
+    while True:
+        try:
+            return _hex_id_pool.popleft()
+        except IndexError:
+            raw = os.urandom(16 * TOKEN_POOL_SIZE)
+            _hex_id_pool.extend(raw[i : i + 16].hex() for i in range(0, len(raw), 16))
+
+
+def _reset_random_pools() -> None:
+    """Drop pooled randomness so a forked worker never reuses the parent's tokens."""
+    _token_pools.clear()
+    _uuid_pool.clear()
+    _hex_id_pool.clear()
+
+
+# Pools fill lazily on first use; pre-fork servers (e.g. gunicorn --preload)
+# must not share them, so children start empty.
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_random_pools)
+
+
 def _mock_credential_jwt(offer: CredentialOffer) -> str:
-    header = {"typ": "JWT", "alg": "ES256"}
     payload = {
         "jti": f"https://medssi.dev/api/credential/{offer.credential_id}",
         "sub": offer.holder_did or "did:example:patient-demo",
@@ -410,75 +676,73 @@ def _mock_credential_jwt(offer: CredentialOffer) -> str:
         "nonce": offer.nonce,
         "ial": offer.ial.value,
     }
-    encoded_header = base64.urlsafe_b64encode(json.dumps(header).encode("utf-8")).decode(
-        "ascii"
-    ).rstrip("=")
-    encoded_payload = base64.urlsafe_b64encode(json.dumps(payload).encode("utf-8")).decode(
-        "ascii"
-    ).rstrip("=")
-    signature = base64.urlsafe_b64encode(
-        f"sig:{offer.credential_id}".encode("utf-8")
-    ).decode("ascii").rstrip("=")
-    return f"{encoded_header}.{encoded_payload}.{signature}"
+    encoded_payload = _b64url(_json_bytes(payload))
+    signature = _b64url(b"sig:" + offer.credential_id.encode("utf-8"))
+    return f"{_JWT_HEADER_B64}.{encoded_payload}.{signature}"
+
+
+_DEFAULT_POLICIES: Tuple[DisclosurePolicy, ...] = (
+    DisclosurePolicy(
+        scope=DisclosureScope.MEDICAL_RECORD,
+        fields=[
+            "condition.code.coding[0].code",
+            "condition.recordedDate",
+            "managing_organization.value",
+        ],
+        description="跨院病歷摘要：診斷碼、紀錄日期、發卡院所",
+    ),
+    DisclosurePolicy(
+        scope=DisclosureScope.MEDICATION_PICKUP,
+        fields=[
+            "medication_dispense[0].medicationCodeableConcept.coding[0].code",
+            "medication_dispense[0].days_supply",
+            "medication_dispense[0].pickup_window_end",
+        ],
+        description="領藥資訊：藥品代碼、給藥天數、取藥期限",
+    ),
+    DisclosurePolicy(
+        scope=DisclosureScope.RESEARCH_ANALYTICS,
+        fields=[
+            "condition.code.coding[0].code",
+            "encounter_summary_hash",
+        ],
+        description="匿名化研究卡：以摘要雜湊與診斷碼提供研究合作",
+    ),
+)
+
+
+_DEFAULT_POLICIES_BY_SCOPE: Dict[DisclosureScope, DisclosurePolicy] = {
+    policy.scope: policy for policy in _DEFAULT_POLICIES
+}
 
 
 def _default_disclosure_policies() -> List[DisclosurePolicy]:
-    return [
-        DisclosurePolicy(
-            scope=DisclosureScope.MEDICAL_RECORD,
-            fields=[
-                "condition.code.coding[0].code",
-                "condition.recordedDate",
-                "managing_organization.value",
-            ],
-            description="跨院病歷摘要：診斷碼、紀錄日期、發卡院所",
-        ),
-        DisclosurePolicy(
-            scope=DisclosureScope.MEDICATION_PICKUP,
-            fields=[
-                "medication_dispense[0].medicationCodeableConcept.coding[0].code",
-                "medication_dispense[0].days_supply",
-                "medication_dispense[0].pickup_window_end",
-            ],
-            description="領藥資訊：藥品代碼、給藥天數、取藥期限",
-        ),
-        DisclosurePolicy(
-            scope=DisclosureScope.RESEARCH_ANALYTICS,
-            fields=[
-                "condition.code.coding[0].code",
-                "encounter_summary_hash",
-            ],
-            description="匿名化研究卡：以摘要雜湊與診斷碼提供研究合作",
-        ),
-    ]
+    return list(_DEFAULT_POLICIES)
 
 
 def _ensure_valid_policies(policies: List[DisclosurePolicy]) -> None:
     if not policies:
-        _raise_problem(
-            status=400,
-            type_="https://medssi.dev/errors/policy-empty",
-            title="Disclosure policies required",
-            detail="Select at least one disclosure policy scope.",
-        )
+        _raise("policy_empty", "Select at least one disclosure policy scope.")
+    if len({policy.scope for policy in policies}) == len(policies) and all(
+        policy.fields for policy in policies
+    ):
+        return
 
+    # Slow path only to report the first offending policy in order.
     seen_scopes = set()
     for policy in policies:
         if policy.scope in seen_scopes:
-            _raise_problem(
-                status=400,
-                type_="https://medssi.dev/errors/policy-duplicate",
-                title="Duplicate disclosure scope",
-                detail=f"Scope {policy.scope} defined more than once.",
-            )
+            _raise("policy_duplicate", f"Scope {policy.scope} defined more than once.")
         seen_scopes.add(policy.scope)
         if not policy.fields:
-            _raise_problem(
-                status=400,
-                type_="https://medssi.dev/errors/policy-fields-empty",
-                title="Disclosure fields required",
-                detail=f"Scope {policy.scope} must list at least one field.",
-            )
+            _raise("policy_fields_empty", f"Scope {policy.scope} must list at least one field.")
+
+
+def _unique_fields(fields: List[str]) -> List[str]:
+    """Drop repeated fields keeping first-seen order; already-unique lists are reused."""
+    if len(set(fields)) == len(fields):
+        return fields
+    return list(dict.fromkeys(fields))
 
 
 def _resolve_policies(
@@ -487,13 +751,11 @@ def _resolve_policies(
     if policies:
         _ensure_valid_policies(policies)
         return policies
-    defaults = _default_disclosure_policies()
-    _ensure_valid_policies(defaults)
-    return defaults
+    return _default_disclosure_policies()
 
 
-def _sample_payload() -> CredentialPayload:
-    today = date.today()
+@lru_cache(maxsize=1)
+def _sample_payload_for(today: date) -> CredentialPayload:
     sample_dict: Dict[str, Any] = {
         "fhir_profile": "https://profiles.iisigroup.com.tw/StructureDefinition/medssi-bundle",
         "condition": {
@@ -519,20 +781,41 @@ def _sample_payload() -> CredentialPayload:
         "consent_expires_on": None,
         "medication_dispense": [],
     }
-    return CredentialPayload.parse_obj(sample_dict)
+    return CredentialPayload.model_validate(sample_dict)
 
 
-def _deep_merge(target: Dict[str, Any], updates: Dict[str, Any]) -> Dict[str, Any]:
-    for key, value in updates.items():
-        if value is None:
-            continue
-        if key not in target:
-            target[key] = value
-            continue
-        if isinstance(value, dict) and isinstance(target.get(key), dict):
-            target[key] = _deep_merge(dict(target[key]), value)
-        else:
-            target[key] = value
+@lru_cache(maxsize=1)
+def _sample_payload_dict(today: date) -> Dict[str, Any]:
+    return _sample_payload_for(today).model_dump()
+
+
+def _sample_payload() -> CredentialPayload:
+    # The validated sample is cached per day; hand out shallow copies so
+    # callers can reassign fields without re-running validation.
+    return _sample_payload_for(date.today()).model_copy()
+
+
+def _deep_merge(
+    target: Dict[str, Any], updates: Dict[str, Any], *, in_place: bool = False
+) -> Dict[str, Any]:
+    """Merge ``updates`` into ``target`` (skipping None values) and return ``target``.
+
+    Nested dicts on the merge path are copied before being updated unless
+    ``in_place`` is set, so ``target`` may share structure with a cached template.
+    """
+    stack = [(target, updates)]
+    while stack:
+        dest, source = stack.pop()
+        for key, value in source.items():
+            if value is None:
+                continue
+            current = dest.get(key)
+            if isinstance(value, dict) and isinstance(current, dict):
+                if not in_place:
+                    current = dest[key] = dict(current)
+                stack.append((current, value))
+            else:
+                dest[key] = value
     return target
 
 
@@ -540,8 +823,7 @@ def _payload_overrides_from_alias(alias_map: Dict[str, str]) -> Optional[Dict[st
     overrides: Dict[str, Any] = {}
 
     def merge(update: Dict[str, Any]) -> None:
-        nonlocal overrides
-        overrides = _deep_merge(overrides, update)
+        _deep_merge(overrides, update, in_place=True)
 
     if alias_map.get("cond_code"):
         merge(
@@ -683,20 +965,19 @@ def _coerce_payload(
 ) -> CredentialPayload:
     if isinstance(payload, CredentialPayload):
         return payload
-    sample = _sample_payload()
     if payload is None:
-        return sample
+        return _sample_payload()
     if isinstance(payload, dict):
-        base = sample.dict()
+        base = dict(_sample_payload_dict(date.today()))
         merged = _deep_merge(base, payload)
         try:
-            return CredentialPayload.parse_obj(merged)
+            return CredentialPayload.model_validate(merged)
         except ValidationError:
-            return sample
+            return _sample_payload()
     try:
-        return CredentialPayload.parse_obj(payload)
+        return CredentialPayload.model_validate(payload)
     except ValidationError:
-        return sample
+        return _sample_payload()
 
 
 def _issue_offer(
@@ -750,18 +1031,21 @@ def _create_offer(
     selected_disclosures: Optional[Dict[str, str]] = None,
     external_fields: Optional[Dict[str, str]] = None,
 ) -> CredentialOffer:
-    now = datetime.utcnow()
-    credential_id = f"cred-{uuid.uuid4().hex}"
-    transaction_id = transaction_id or str(uuid.uuid4())
-    nonce = secrets.token_urlsafe(16)
-    qr_token = secrets.token_urlsafe(24)
-
-    offer = CredentialOffer(
+    now = utcnow()
+    credential_id = f"cred-{_hex_id()}"
+    transaction_id = transaction_id or str(_uuid4())
+    nonce = _urlsafe_token(16)
+    qr_token = _urlsafe_token(24)
+
+    # Inputs are validated request models, enums and freshly generated values,
+    # so skip a second validation pass; dicts are copied as validation would.
+    offer = CredentialOffer.model_construct(
         credential_id=credential_id,
         transaction_id=transaction_id,
         issuer_id=issuer_id,
         primary_scope=primary_scope,
         ial=ial,
+        ial_description=describe_ial(ial),
         mode=mode,
         qr_token=qr_token,
         nonce=nonce,
@@ -774,92 +1058,120 @@ def _create_offer(
         holder_hint=holder_hint,
         payload=payload,
         payload_template=payload_template,
-        selected_disclosures=selected_disclosures or {},
-        external_fields=external_fields or {},
+        selected_disclosures=dict(selected_disclosures or {}),
+        external_fields=dict(external_fields or {}),
     )
     store.persist_credential(offer)
     return offer
 
 
-def _get_child(current: Any, name: str) -> Any:
-    if current is None:
-        return None
-    if isinstance(current, BaseModel):
-        return getattr(current, name, None)
-    if isinstance(current, dict):
-        return current.get(name)
-    return getattr(current, name, None)
-
-
-def _resolve_payload_value(payload: Optional[CredentialPayload], path: str) -> Optional[str]:
-    if payload is None:
-        return None
+@lru_cache(maxsize=1024)
+def _compile_path(path: str) -> Optional[Tuple[Union[str, int], ...]]:
+    """Split a disclosure path into attribute names (str) and list indexes (int).
 
-    current: Any = payload
+    Returns None when the path contains a malformed index, which can never resolve.
+    """
+    ops: List[Union[str, int]] = []
     for segment in path.split('.'):
         if not segment:
             continue
         while '[' in segment:
             attr, rest = segment.split('[', 1)
             if attr:
-                current = _get_child(current, attr)
-            if current is None:
+                ops.append(attr)
+            index_str, sep, remainder = rest.partition(']')
+            if not sep:
                 return None
-            index_str, remainder = rest.split(']', 1)
             try:
-                index = int(index_str)
+                ops.append(int(index_str))
             except ValueError:
                 return None
-            if not isinstance(current, (list, tuple)):
-                return None
-            if index >= len(current):
-                return None
-            current = current[index]
             segment = remainder
             if segment.startswith('.'):
                 segment = segment[1:]
         if segment:
-            current = _get_child(current, segment)
-        if current is None:
-            return None
-
-    if isinstance(current, (date, datetime)):
-        return current.isoformat()
-    if isinstance(current, (str, int, float)):
-        return str(current)
-    if isinstance(current, BaseModel):
-        return current.json()
-    if isinstance(current, dict):
-        return str(current)
+            ops.append(segment)
+    return tuple(ops)
+
+
+def _payload_text(value: Any) -> Optional[str]:
+    """Text of a scalar payload leaf; composite values (models, dicts) never resolve."""
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, (str, int, float)):
+        return str(value)
     return None
 
 
+_ACCESSOR_MISSES = (AttributeError, IndexError, KeyError, TypeError)
+
+
+def _compile_accessor(ops: Tuple[Union[str, int], ...]) -> Tuple[Callable[[Any], Any], ...]:
+    """Turn compiled path ops into C-level getters: dotted attrgetters split by itemgetters."""
+    getters: List[Callable[[Any], Any]] = []
+    attrs: List[str] = []
+    for op in ops:
+        if type(op) is int:
+            if attrs:
+                getters.append(attrgetter(".".join(attrs)))
+                attrs = []
+            getters.append(itemgetter(op))
+        else:
+            attrs.append(op)
+    if attrs:
+        getters.append(attrgetter(".".join(attrs)))
+    return tuple(getters)
+
+
+@lru_cache(maxsize=1024)
+def _field_accessors(field: str) -> Tuple[Tuple[Callable[[Any], Any], ...], ...]:
+    """Payload accessors tried for a disclosure field, MODA alias first."""
+    candidates = (MODA_FIELD_TO_FHIR.get(field), field)
+    compiled = (_compile_path(path) for path in candidates if path)
+    return tuple(_compile_accessor(ops) for ops in compiled if ops is not None)
+
+
 def _resolve_field_value(credential: CredentialOffer, field: str) -> Optional[str]:
     if field in credential.external_fields:
         value = credential.external_fields[field]
         if value not in (None, ""):
             return str(value)
-    fhir_path = MODA_FIELD_TO_FHIR.get(field)
-    if fhir_path:
-        resolved = _resolve_payload_value(credential.payload, fhir_path)
+    payload = credential.payload
+    if payload is None:
+        return None
+    for getters in _field_accessors(field):
+        current: Any = payload
+        try:
+            for getter in getters:
+                current = getter(current)
+        except _ACCESSOR_MISSES:
+            continue
+        resolved = _payload_text(current)
         if resolved is not None:
             return resolved
-    return _resolve_payload_value(credential.payload, field)
+    return None
+
+
+def _resolved_field_values(credential: CredentialOffer, fields: Iterable[str]) -> Dict[str, Optional[str]]:
+    """Resolve ``fields`` against the credential, reusing values from earlier presentations."""
+    cache = credential.resolved_value_cache()
+    for field in fields:
+        if field not in cache:
+            cache[field] = _resolve_field_value(credential, field)
+    return cache
 
 
 def _select_allowed_fields(offer: CredentialOffer, disclosures: Dict[str, str]) -> Dict[str, str]:
-    allowed = {
-        field
-        for policy in offer.disclosure_policies
-        for field in policy.fields
-    }
+    if not disclosures:
+        return disclosures
+    allowed = offer.allowed_disclosure_fields()
+    if disclosures.keys() <= allowed:
+        return disclosures
     invalid = [field for field in disclosures if field not in allowed]
     if invalid:
-        _raise_problem(
-            status=400,
-            type_="https://medssi.dev/errors/disclosure-invalid",
-            title="Field outside of disclosure policy",
-            detail=f"Fields {', '.join(invalid)} not allowed for this credential.",
+        _raise(
+            "disclosure_invalid",
+            f"Fields {', '.join(invalid)} not allowed for this credential.",
         )
     return disclosures
 
@@ -872,8 +1184,8 @@ def _retention_days(scope: DisclosureScope) -> int:
     return 30
 
 
-def _touch_retention(offer: CredentialOffer) -> None:
-    issued_at = datetime.utcnow()
+def _touch_retention(offer: CredentialOffer, now: Optional[datetime] = None) -> None:
+    issued_at = now or utcnow()
     offer.issued_at = issued_at
     offer.retention_expires_at = issued_at + timedelta(days=_retention_days(offer.primary_scope))
     offer.last_action_at = issued_at
@@ -939,7 +1251,7 @@ def _issue_from_moda_request(request: MODAIssuanceRequest) -> Tuple[CredentialOf
     alias_map = _expand_aliases(
         {field.ename: field.content or "" for field in request.fields if field.ename}
     )
-    policy_fields = list(dict.fromkeys(alias_map.keys()))
+    policy_fields = list(alias_map)
     if not policy_fields:
         policy_fields = MODA_SCOPE_DEFAULT_FIELDS.get(scope, ["cond_code"])
 
@@ -988,9 +1300,9 @@ def _issue_with_data_from_payload(payload: Dict[str, Any]) -> Tuple[CredentialOf
         if "disclosurePolicies" in payload:
             payload["disclosurePolicies"] = _normalize_scope_entries(payload["disclosurePolicies"])
         if "vcUid" in payload:
-            moda_request = MODAIssuanceRequest.parse_obj(payload)
+            moda_request = MODAIssuanceRequest.model_validate(payload)
             return _issue_from_moda_request(moda_request)
-        request = IssuanceWithDataRequest.parse_obj(payload)
+        request = IssuanceWithDataRequest.model_validate(payload)
         return _issue_from_data_request(request)
     except ValidationError as exc:
         raise HTTPException(status_code=400, detail=json.loads(exc.json())) from exc
@@ -1001,48 +1313,87 @@ def _issue_template_from_payload(payload: Dict[str, Any]) -> Tuple[CredentialOff
         if "disclosurePolicies" in payload:
             payload["disclosurePolicies"] = _normalize_scope_entries(payload["disclosurePolicies"])
         if "vcUid" in payload:
-            moda_request = MODAIssuanceRequest.parse_obj(payload)
+            moda_request = MODAIssuanceRequest.model_validate(payload)
             return _issue_from_moda_request(moda_request)
-        request = IssuanceWithoutDataRequest.parse_obj(payload)
+        request = IssuanceWithoutDataRequest.model_validate(payload)
         return _issue_from_template_request(request)
     except ValidationError as exc:
         raise HTTPException(status_code=400, detail=json.loads(exc.json())) from exc
 
 
-def _build_issue_response(offer: CredentialOffer, qr_payload: str) -> GovIssueResponse:
-    return GovIssueResponse(
-        transaction_id=offer.transaction_id,
-        qr_code=_make_qr_data_uri(qr_payload),
-        qr_payload=qr_payload,
-        deep_link=_build_deep_link(
+def _json_response(content: Any, status_code: int = 200) -> Response:
+    """Wrap pre-serialized content so FastAPI skips response-model validation."""
+    if orjson is not None:
+        return ORJSONResponse(content, status_code=status_code)
+    return JSONResponse(content, status_code=status_code)
+
+
+def _json_datetime(value: datetime) -> str:
+    """ISO 8601 text matching ``model_dump(mode="json")``, which writes UTC as ``Z``."""
+    text = value.isoformat()
+    return text[:-6] + "Z" if text.endswith("+00:00") else text
+
+
+# Lists longer than this are streamed item by item instead of buffered.
+STREAM_LIST_THRESHOLD = 100
+
+
+def _json_array_stream(items: Iterable[BaseModel]) -> Iterator[bytes]:
+    yield b"["
+    separator = b""
+    for item in items:
+        yield separator + _json_bytes(item.model_dump(mode="json"))
+        separator = b","
+    yield b"]"
+
+
+def _dump_optional(model: Optional[BaseModel]) -> Optional[Dict[str, Any]]:
+    return model.model_dump(mode="json") if model is not None else None
+
+
+def _build_issue_response(offer: CredentialOffer, qr_payload: str) -> Dict[str, Any]:
+    """GovIssueResponse body keyed by its camelCase aliases."""
+    return {
+        "transactionId": offer.transaction_id,
+        "qrCode": _make_qr_data_uri(qr_payload),
+        "qrPayload": qr_payload,
+        "deepLink": _build_deep_link(
             offer.qr_token,
             kind="credential",
             transaction_id=offer.transaction_id,
         ),
-        credential_id=offer.credential_id,
-        expires_at=offer.expires_at,
-        ial=offer.ial,
-        ial_description=offer.ial_description,
-        scope=offer.primary_scope,
-    )
+        "credentialId": offer.credential_id,
+        "expiresAt": _json_datetime(offer.expires_at),
+        "ial": offer.ial.value,
+        "ialDescription": offer.ial_description,
+        "scope": offer.primary_scope.value,
+    }
 
 
-def _build_nonce_response(offer: CredentialOffer) -> GovCredentialNonceResponse:
-    return GovCredentialNonceResponse(
-        transaction_id=offer.transaction_id,
-        credential_id=offer.credential_id,
-        credential_status=offer.status,
-        nonce=offer.nonce,
-        ial=offer.ial,
-        ial_description=offer.ial_description,
-        mode=offer.mode,
-        expires_at=offer.expires_at,
-        payload_available=offer.payload is not None,
-        disclosure_policies=offer.disclosure_policies,
-        payload_template=offer.payload_template,
-        payload=offer.payload,
-        credential=_mock_credential_jwt(offer),
-    )
+def _build_nonce_response(offer: CredentialOffer) -> Dict[str, Any]:
+    """GovCredentialNonceResponse body keyed by its camelCase aliases."""
+    return {
+        "transactionId": offer.transaction_id,
+        "credentialId": offer.credential_id,
+        "credentialStatus": offer.status.value,
+        "nonce": offer.nonce,
+        "ial": offer.ial.value,
+        "ialDescription": offer.ial_description,
+        "mode": offer.mode.value,
+        "expiresAt": _json_datetime(offer.expires_at),
+        "payloadAvailable": offer.payload is not None,
+        "disclosurePolicies": [
+            policy.model_dump(mode="json") for policy in offer.disclosure_policies
+        ],
+        "payloadTemplate": _dump_optional(offer.payload_template),
+        "payload": _dump_optional(offer.payload),
+        "credential": _mock_credential_jwt(offer),
+    }
+
+
+def _build_qr_code_response(offer: CredentialOffer, qr_payload: str) -> Dict[str, Any]:
+    """QRCodeResponse body."""
+    return {"credential": offer.model_dump(mode="json"), "qr_payload": qr_payload}
 
 
 @api_v2.post(
@@ -1050,9 +1401,9 @@ def _build_nonce_response(offer: CredentialOffer) -> GovCredentialNonceResponse:
     response_model=QRCodeResponse,
     dependencies=[Depends(require_issuer_token)],
 )
-def create_qr_with_data(request: IssuanceWithDataRequest) -> QRCodeResponse:
+def create_qr_with_data(request: IssuanceWithDataRequest) -> Response:
     offer, qr_payload = _issue_from_data_request(request)
-    return QRCodeResponse(credential=offer, qr_payload=qr_payload)
+    return _json_response(_build_qr_code_response(offer, qr_payload))
 
 
 @api_v2.post(
@@ -1060,9 +1411,9 @@ def create_qr_with_data(request: IssuanceWithDataRequest) -> QRCodeResponse:
     response_model=QRCodeResponse,
     dependencies=[Depends(require_issuer_token)],
 )
-def create_qr_without_data(request: IssuanceWithoutDataRequest) -> QRCodeResponse:
+def create_qr_without_data(request: IssuanceWithoutDataRequest) -> Response:
     offer, qr_payload = _issue_from_template_request(request)
-    return QRCodeResponse(credential=offer, qr_payload=qr_payload)
+    return _json_response(_build_qr_code_response(offer, qr_payload))
 
 
 api_public = APIRouter(prefix="/api", tags=["MODA Sandbox compatibility"])
@@ -1074,9 +1425,9 @@ api_public = APIRouter(prefix="/api", tags=["MODA Sandbox compatibility"])
     status_code=201,
     dependencies=[Depends(require_issuer_token)],
 )
-def gov_issue_with_data(payload: Dict[str, Any] = Body(...)) -> GovIssueResponse:
+def gov_issue_with_data(payload: Dict[str, Any] = Body(...)) -> Response:
     offer, qr_payload = _issue_with_data_from_payload(payload)
-    return _build_issue_response(offer, qr_payload)
+    return _json_response(_build_issue_response(offer, qr_payload), status_code=201)
 
 
 @api_public.post(
@@ -1085,9 +1436,9 @@ def gov_issue_with_data(payload: Dict[str, Any] = Body(...)) -> GovIssueResponse
     status_code=201,
     dependencies=[Depends(require_issuer_token)],
 )
-def gov_issue_medical_card(payload: Dict[str, Any] = Body(...)) -> GovIssueResponse:
+def gov_issue_medical_card(payload: Dict[str, Any] = Body(...)) -> Response:
     offer, qr_payload = _issue_with_data_from_payload(payload)
-    return _build_issue_response(offer, qr_payload)
+    return _json_response(_build_issue_response(offer, qr_payload), status_code=201)
 
 
 @api_public.post(
@@ -1096,9 +1447,9 @@ def gov_issue_medical_card(payload: Dict[str, Any] = Body(...)) -> GovIssueRespo
     status_code=201,
     dependencies=[Depends(require_issuer_token)],
 )
-def gov_issue_without_data(payload: Dict[str, Any] = Body(...)) -> GovIssueResponse:
+def gov_issue_without_data(payload: Dict[str, Any] = Body(...)) -> Response:
     offer, qr_payload = _issue_template_from_payload(payload)
-    return _build_issue_response(offer, qr_payload)
+    return _json_response(_build_issue_response(offer, qr_payload), status_code=201)
 
 
 @api_public.get(
@@ -1106,7 +1457,7 @@ def gov_issue_without_data(payload: Dict[str, Any] = Body(...)) -> GovIssueRespo
     response_model=GovCredentialNonceResponse,
     dependencies=[Depends(require_wallet_token)],
 )
-def gov_get_nonce(transaction_id: str) -> GovCredentialNonceResponse:
+def gov_get_nonce(transaction_id: str) -> Response:
     offer = store.get_credential_by_transaction(transaction_id)
     if not offer:
         raise HTTPException(
@@ -1116,7 +1467,7 @@ def gov_get_nonce(transaction_id: str) -> GovCredentialNonceResponse:
                 "message": "指定VC不存在，QR Code尚未被掃描",
             },
         )
-    return _build_nonce_response(offer)
+    return _json_response(_build_nonce_response(offer))
 
 
 @api_public.get(
@@ -1124,7 +1475,7 @@ def gov_get_nonce(transaction_id: str) -> GovCredentialNonceResponse:
     response_model=GovCredentialNonceResponse,
     dependencies=[Depends(require_wallet_token)],
 )
-def gov_get_nonce_query(transactionId: str = Query(..., alias="transactionId")) -> GovCredentialNonceResponse:
+def gov_get_nonce_query(transactionId: str = Query(..., alias="transactionId")) -> Response:
     return gov_get_nonce(transactionId)
 
 
@@ -1132,7 +1483,7 @@ def gov_get_nonce_query(transactionId: str = Query(..., alias="transactionId"))
     "/credential/{credential_id}/{action}",
     dependencies=[Depends(require_issuer_token)],
 )
-def gov_update_credential(credential_id: str, action: str) -> Dict[str, Any]:
+def gov_update_credential(credential_id: str, action: str) -> Response:
     if action.lower() != "revocation":
         raise HTTPException(
             status_code=400,
@@ -1145,7 +1496,9 @@ def gov_update_credential(credential_id: str, action: str) -> Dict[str, Any]:
             status_code=404,
             detail={"code": "61006", "message": "不合法的VC識別碼"},
         ) from None
-    return {"credentialStatus": CredentialStatus.REVOKED.value, "credentialId": credential_id}
+    return _json_response(
+        {"credentialStatus": CredentialStatus.REVOKED.value, "credentialId": credential_id}
+    )
 
 
 @api_public.post(
@@ -1154,33 +1507,26 @@ def gov_update_credential(credential_id: str, action: str) -> Dict[str, Any]:
     status_code=201,
     dependencies=[Depends(require_verifier_token)],
 )
-def gov_create_oidvp_qrcode(payload: OIDVPSessionRequest) -> OIDVPQRCodeResponse:
+def gov_create_oidvp_qrcode(payload: OIDVPSessionRequest) -> Response:
     fields = payload.fields or []
     if len(fields) == 1 and "," in fields[0]:
         fields = [segment.strip() for segment in fields[0].split(",") if segment.strip()]
     if not fields:
-        fallback_policy = next(
-            (
-                policy
-                for policy in _default_disclosure_policies()
-                if policy.scope == payload.scope
-            ),
-            None,
-        )
+        fallback_policy = _DEFAULT_POLICIES_BY_SCOPE.get(payload.scope)
         fields = list(fallback_policy.fields) if fallback_policy else ["condition.code.coding[0].code"]
 
-    now = datetime.utcnow()
-    transaction_id = payload.transaction_id or str(uuid.uuid4())
+    now = utcnow()
+    transaction_id = payload.transaction_id or str(_uuid4())
     session = VerificationSession(
-        session_id=f"sess-{uuid.uuid4().hex}",
+        session_id=f"sess-{_hex_id()}",
         transaction_id=transaction_id,
         verifier_id=payload.verifier_id,
         verifier_name=payload.verifier_name,
         purpose=payload.purpose or "憑證驗證",
         required_ial=payload.ial,
         scope=payload.scope,
-        allowed_fields=list(dict.fromkeys(fields)),
-        qr_token=secrets.token_urlsafe(24),
+        allowed_fields=_unique_fields(fields),
+        qr_token=_urlsafe_token(24),
         created_at=now,
         expires_at=now + timedelta(minutes=payload.valid_minutes),
         last_polled_at=now,
@@ -1188,18 +1534,21 @@ def gov_create_oidvp_qrcode(payload: OIDVPSessionRequest) -> OIDVPQRCodeResponse
     )
     store.persist_verification_session(session)
     qr_payload = _build_qr_payload(session.qr_token, "vp-session")
-    return OIDVPQRCodeResponse(
-        transaction_id=transaction_id,
-        qrcode_image=_make_qr_data_uri(qr_payload),
-        auth_uri=_build_deep_link(
-            session.qr_token,
-            kind="oidvp",
-            transaction_id=transaction_id,
-        ),
-        qr_payload=qr_payload,
-        scope=session.scope,
-        ial=session.required_ial,
-        expires_at=session.expires_at,
+    return _json_response(
+        {
+            "transactionId": transaction_id,
+            "qrcodeImage": _make_qr_data_uri(qr_payload),
+            "authUri": _build_deep_link(
+                session.qr_token,
+                kind="oidvp",
+                transaction_id=transaction_id,
+            ),
+            "qrPayload": qr_payload,
+            "scope": session.scope.value,
+            "ial": session.required_ial.value,
+            "expiresAt": _json_datetime(session.expires_at),
+        },
+        status_code=201,
     )
 
 
@@ -1208,7 +1557,7 @@ def gov_create_oidvp_qrcode(payload: OIDVPSessionRequest) -> OIDVPQRCodeResponse
     response_model=OIDVPResultResponse,
     dependencies=[Depends(require_verifier_token)],
 )
-def gov_fetch_oidvp_result(payload: OIDVPResultRequest) -> OIDVPResultResponse:
+def gov_fetch_oidvp_result(payload: OIDVPResultRequest) -> Response:
     session = store.get_verification_session_by_transaction(payload.transaction_id)
     if not session:
         raise HTTPException(
@@ -1221,7 +1570,7 @@ def gov_fetch_oidvp_result(payload: OIDVPResultRequest) -> OIDVPResultResponse:
             status_code=400,
             detail={"code": "400", "message": "尚未接收到使用者上傳資料"},
         )
-    session.last_polled_at = datetime.utcnow()
+    session.last_polled_at = utcnow()
     store.persist_verification_session(session)
     claims = [
         {
@@ -1233,11 +1582,13 @@ def gov_fetch_oidvp_result(payload: OIDVPResultRequest) -> OIDVPResultResponse:
         }
     ]
     description = "success" if result.verified else "failed"
-    return OIDVPResultResponse(
-        verify_result=result.verified,
-        result_description=description,
-        transaction_id=payload.transaction_id,
-        data=claims,
+    return _json_response(
+        {
+            "verifyResult": result.verified,
+            "resultDescription": description,
+            "transactionId": payload.transaction_id,
+            "data": claims,
+        }
     )
 
 @api_v2.post(
@@ -1245,37 +1596,38 @@ def gov_fetch_oidvp_result(payload: OIDVPResultRequest) -> OIDVPResultResponse:
     response_model=CredentialOffer,
     dependencies=[Depends(require_issuer_token)],
 )
-def revoke_credential(credential_id: str) -> CredentialOffer:
-    credential = store.get_credential(credential_id)
-    if not credential:
-        _raise_problem(
-            status=404,
-            type_="https://medssi.dev/errors/credential-not-found",
-            title="Credential not found",
-            detail=f"Credential {credential_id} does not exist.",
-        )
-
-    credential.status = CredentialStatus.REVOKED
-    credential.last_action_at = datetime.utcnow()
-    credential.retention_expires_at = credential.last_action_at
-    store.update_credential(credential)
-    return credential
+def revoke_credential(credential_id: str) -> Response:
+    try:
+        credential = store.revoke_credential(credential_id)
+    except KeyError:
+        _raise("credential_not_found", f"Credential {credential_id} does not exist.")
+    return _json_response(credential.model_dump(mode="json"))
 
 
 @api_v2.delete(
     "/api/credentials/{credential_id}",
     dependencies=[Depends(require_issuer_token)],
 )
-def delete_credential(credential_id: str):
-    if not store.get_credential(credential_id):
-        _raise_problem(
-            status=404,
-            type_="https://medssi.dev/errors/credential-not-found",
-            title="Credential not found",
-            detail=f"Credential {credential_id} does not exist.",
-        )
-    store.delete_credential(credential_id)
-    return {"credential_id": credential_id, "status": "DELETED"}
+def delete_credential(credential_id: str) -> Response:
+    if store.delete_credential(credential_id) is None:
+        _raise("credential_not_found", f"Credential {credential_id} does not exist.")
+    return _json_response({"credential_id": credential_id, "status": "DELETED"})
+
+
+# Canonical hyphenated form; anything else falls back to uuid.UUID parsing.
+_CANONICAL_UUID_RE = re.compile(
+    r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}", re.IGNORECASE
+)
+
+
+def _is_uuid_string(value: str) -> bool:
+    if _CANONICAL_UUID_RE.fullmatch(value):
+        return True
+    try:
+        uuid.UUID(value)
+    except ValueError:
+        return False
+    return True
 
 
 @api_v2.get(
@@ -1283,127 +1635,114 @@ def delete_credential(credential_id: str):
     response_model=NonceResponse,
     dependencies=[Depends(require_wallet_token)],
 )
-def get_nonce(transactionId: str = Query(..., alias="transactionId")) -> NonceResponse:  # noqa: N802
-    try:
-        uuid.UUID(transactionId)
-    except ValueError:
-        _raise_problem(
-            status=400,
-            type_="https://medssi.dev/errors/transaction-id",
-            title="transactionId invalid",
-            detail="transactionId must be a UUIDv4 string.",
-        )
+async def get_nonce(transactionId: str = Query(..., alias="transactionId")) -> Response:  # noqa: N802
+    if not _is_uuid_string(transactionId):
+        _raise("transaction_id", "transactionId must be a UUIDv4 string.")
 
     offer = store.get_credential_by_transaction(transactionId)
     if not offer:
-        _raise_problem(
-            status=404,
-            type_="https://medssi.dev/errors/transaction-not-found",
-            title="Transaction not found",
-            detail="No credential offer found for this transactionId.",
-        )
+        _raise("transaction_not_found", "No credential offer found for this transactionId.")
     if not offer.is_active():
-        _raise_problem(
-            status=410,
-            type_="https://medssi.dev/errors/offer-expired",
-            title="Credential offer expired",
-            detail="The QR Code has expired or the credential was revoked.",
-        )
+        _raise("offer_expired", "The QR Code has expired or the credential was revoked.")
 
-    return NonceResponse(
-        transaction_id=offer.transaction_id,
-        credential_id=offer.credential_id,
-        nonce=offer.nonce,
-        ial=offer.ial,
-        status=offer.status,
-        expires_at=offer.expires_at,
-        mode=offer.mode,
-        disclosure_policies=offer.disclosure_policies,
-        payload_available=offer.payload is not None,
-        payload_template=offer.payload_template,
+    return _json_response(
+        {
+            "transaction_id": offer.transaction_id,
+            "credential_id": offer.credential_id,
+            "nonce": offer.nonce,
+            "ial": offer.ial.value,
+            "ial_description": offer.ial_description,
+            "status": offer.status.value,
+            "expires_at": _json_datetime(offer.expires_at),
+            "mode": offer.mode.value,
+            "disclosure_policies": [
+                policy.model_dump(mode="json") for policy in offer.disclosure_policies
+            ],
+            "payload_available": offer.payload is not None,
+            "payload_template": _dump_optional(offer.payload_template),
+        }
     )
 
 
+def _accept_credential(
+    credential: CredentialOffer, payload: CredentialActionRequest, now: datetime
+) -> None:
+    if credential.status == CredentialStatus.REVOKED:
+        _raise("credential_revoked", "Revoked credentials cannot be accepted.")
+    if not payload.holder_did and not credential.holder_did:
+        _raise("missing_holder", "Provide holder_did when accepting the credential.")
+    if credential.mode is IssuanceMode.WITHOUT_DATA:
+        if payload.payload is None:
+            _raise(
+                "missing_payload",
+                "Submit the FHIR payload when accepting a placeholder credential.",
+            )
+        credential.payload = payload.payload
+    elif payload.payload is not None:
+        credential.payload = payload.payload
+
+    disclosures = payload.disclosures or {}
+    credential.selected_disclosures = _select_allowed_fields(credential, disclosures)
+    if payload.holder_did:
+        credential.holder_did = payload.holder_did
+    credential.status = CredentialStatus.ISSUED
+    _touch_retention(credential, now)
+
+
+def _update_credential(
+    credential: CredentialOffer, payload: CredentialActionRequest, now: datetime
+) -> None:
+    if credential.status != CredentialStatus.ISSUED:
+        _raise("credential_not_issued", "Only issued credentials can be updated.")
+    if payload.payload:
+        credential.payload = payload.payload
+    if payload.disclosures:
+        credential.selected_disclosures = _select_allowed_fields(credential, payload.disclosures)
+    credential.last_action_at = now
+
+
+def _decline_credential(
+    credential: CredentialOffer, payload: CredentialActionRequest, now: datetime
+) -> None:
+    credential.status = CredentialStatus.DECLINED
+    credential.last_action_at = now
+
+
+def _revoke_credential(
+    credential: CredentialOffer, payload: CredentialActionRequest, now: datetime
+) -> None:
+    credential.status = CredentialStatus.REVOKED
+    credential.retention_expires_at = now
+    credential.last_action_at = now
+
+
+_ACTION_HANDLERS: Dict[
+    CredentialAction, Callable[[CredentialOffer, CredentialActionRequest, datetime], None]
+] = {
+    CredentialAction.ACCEPT: _accept_credential,
+    CredentialAction.UPDATE: _update_credential,
+    CredentialAction.DECLINE: _decline_credential,
+    CredentialAction.REVOKE: _revoke_credential,
+}
+
+
 @api_v2.put(
     "/api/credential/{credential_id}/action",
     response_model=CredentialOffer,
     dependencies=[Depends(require_wallet_token)],
 )
-def handle_credential_action(credential_id: str, payload: CredentialActionRequest) -> CredentialOffer:
-    credential = store.get_credential(credential_id)
-    if not credential:
-        _raise_problem(
-            status=404,
-            type_="https://medssi.dev/errors/credential-not-found",
-            title="Credential not found",
-            detail=f"Credential {credential_id} does not exist.",
-        )
+def handle_credential_action(credential_id: str, payload: CredentialActionRequest) -> Response:
+    now = utcnow()
+    with store.edit_credential(credential_id) as credential:
+        if not credential:
+            _raise("credential_not_found", f"Credential {credential_id} does not exist.")
 
-    now = datetime.utcnow()
+        handler = _ACTION_HANDLERS.get(payload.action)
+        if handler is None:
+            _raise("unsupported_action", f"Action {payload.action} is not supported.")
+        handler(credential, payload, now)
 
-    if payload.action == CredentialAction.ACCEPT:
-        if credential.status == CredentialStatus.REVOKED:
-            _raise_problem(
-                status=400,
-                type_="https://medssi.dev/errors/credential-revoked",
-                title="Credential revoked",
-                detail="Revoked credentials cannot be accepted.",
-            )
-        if not payload.holder_did and not credential.holder_did:
-            _raise_problem(
-                status=400,
-                type_="https://medssi.dev/errors/missing-holder",
-                title="Holder DID required",
-                detail="Provide holder_did when accepting the credential.",
-            )
-        if credential.mode is IssuanceMode.WITHOUT_DATA:
-            if payload.payload is None:
-                _raise_problem(
-                    status=400,
-                    type_="https://medssi.dev/errors/missing-payload",
-                    title="Payload required",
-                    detail="Submit the FHIR payload when accepting a placeholder credential.",
-                )
-            credential.payload = payload.payload
-        elif payload.payload is not None:
-            credential.payload = payload.payload
-
-        disclosures = payload.disclosures or {}
-        credential.selected_disclosures = _select_allowed_fields(credential, disclosures)
-        if payload.holder_did:
-            credential.holder_did = payload.holder_did
-        credential.status = CredentialStatus.ISSUED
-        _touch_retention(credential)
-    elif payload.action == CredentialAction.UPDATE:
-        if credential.status != CredentialStatus.ISSUED:
-            _raise_problem(
-                status=400,
-                type_="https://medssi.dev/errors/credential-not-issued",
-                title="Credential not issued",
-                detail="Only issued credentials can be updated.",
-            )
-        if payload.payload:
-            credential.payload = payload.payload
-        if payload.disclosures:
-            credential.selected_disclosures = _select_allowed_fields(credential, payload.disclosures)
-        credential.last_action_at = now
-    elif payload.action == CredentialAction.DECLINE:
-        credential.status = CredentialStatus.DECLINED
-        credential.last_action_at = now
-    elif payload.action == CredentialAction.REVOKE:
-        credential.status = CredentialStatus.REVOKED
-        credential.retention_expires_at = now
-        credential.last_action_at = now
-    else:
-        _raise_problem(
-            status=400,
-            type_="https://medssi.dev/errors/unsupported-action",
-            title="Unsupported action",
-            detail=f"Action {payload.action} is not supported.",
-        )
-
-    store.update_credential(credential)
-    return credential
+    return _json_response(credential.model_dump(mode="json"))
 
 
 @api_v2.get(
@@ -1411,8 +1750,11 @@ def handle_credential_action(credential_id: str, payload: CredentialActionReques
     response_model=List[CredentialOffer],
     dependencies=[Depends(require_wallet_token)],
 )
-def list_holder_credentials(holder_did: str) -> List[CredentialOffer]:
-    return store.list_credentials_for_holder(holder_did)
+def list_holder_credentials(holder_did: str) -> Response:
+    credentials = store.list_credentials_for_holder(holder_did)
+    if len(credentials) > STREAM_LIST_THRESHOLD:
+        return StreamingResponse(_json_array_stream(credentials), media_type="application/json")
+    return _json_response([credential.model_dump(mode="json") for credential in credentials])
 
 
 @api_v2.delete(
@@ -1420,8 +1762,8 @@ def list_holder_credentials(holder_did: str) -> List[CredentialOffer]:
     response_model=ForgetSummary,
     dependencies=[Depends(require_wallet_token)],
 )
-def forget_holder(holder_did: str) -> ForgetSummary:
-    return store.forget_holder(holder_did)
+def forget_holder(holder_did: str) -> Response:
+    return _json_response(store.forget_holder(holder_did).model_dump(mode="json"))
 
 
 @api_v2.get(
@@ -1441,147 +1783,186 @@ def get_verification_code(
         ..., description="List of fields requested for selective disclosure"
     ),
     validMinutes: int = Query(5, ge=1, le=5, alias="validMinutes"),
-) -> VerificationCodeResponse:
+) -> Response:
     if len(fields) == 1 and "," in fields[0]:
         fields = [segment.strip() for segment in fields[0].split(",") if segment.strip()]
 
     if not fields:
-        _raise_problem(
-            status=400,
-            type_="https://medssi.dev/errors/fields-required",
-            title="At least one field required",
-            detail="Provide at least one selective disclosure field.",
-        )
+        _raise("fields_required", "Provide at least one selective disclosure field.")
 
-    now = datetime.utcnow()
+    now = utcnow()
     session = VerificationSession(
-        session_id=f"sess-{uuid.uuid4().hex}",
+        session_id=f"sess-{_hex_id()}",
         verifier_id=verifierId,
         verifier_name=verifierName,
         purpose=purpose,
         required_ial=ial_min,
         scope=scope,
-        allowed_fields=list(dict.fromkeys(fields)),
-        qr_token=secrets.token_urlsafe(24),
+        allowed_fields=_unique_fields(fields),
+        qr_token=_urlsafe_token(24),
         created_at=now,
         expires_at=now + timedelta(minutes=validMinutes),
         last_polled_at=now,
     )
     store.persist_verification_session(session)
     qr_payload = _build_qr_payload(session.qr_token, "vp-session")
-    return VerificationCodeResponse(session=session, qr_payload=qr_payload)
+    return _json_response({"session": session.model_dump(mode="json"), "qr_payload": qr_payload})
 
 
-@api_v2.post(
-    "/api/did/vp/result",
-    response_model=RiskInsightResponse,
-    dependencies=[Depends(require_verifier_token)],
+# Resolved once at import; the engine is a stateless module singleton.
+_RISK_ENGINE = get_risk_engine()
+
+_PROBLEM_SESSION_EXPIRED = _problem(
+    status=410,
+    type_="https://medssi.dev/errors/session-expired",
+    title="Verification session expired",
+    detail="Create a new QR code to verify credentials.",
+)
+_PROBLEM_HOLDER_CREDENTIAL_NOT_FOUND = _problem(
+    status=404,
+    type_="https://medssi.dev/errors/credential-not-found",
+    title="Credential not found",
+    detail="Holder credential not located.",
+)
+_PROBLEM_PRESENTED_NOT_ISSUED = _problem(
+    status=400,
+    type_="https://medssi.dev/errors/credential-not-issued",
+    title="Credential not issued",
+    detail="Only issued credentials may be presented.",
+)
+_PROBLEM_IAL_MISMATCH = _problem(
+    status=403,
+    type_="https://medssi.dev/errors/ial-mismatch",
+    title="Identity assurance insufficient",
+    detail="Credential assurance level below verifier minimum.",
+)
+_PROBLEM_HOLDER_MISMATCH = _problem(
+    status=403,
+    type_="https://medssi.dev/errors/holder-mismatch",
+    title="Holder DID mismatch",
+    detail="Presentation holder does not match credential owner.",
+)
+_PROBLEM_FIELDS_NOT_AUTHORIZED = _problem(
+    status=400,
+    type_="https://medssi.dev/errors/fields-not-authorized",
+    title="Unauthorized disclosure field",
+    detail="Presentation includes fields outside session scope.",
+)
+_PROBLEM_FIELDS_NOT_CONSENTED = _problem(
+    status=400,
+    type_="https://medssi.dev/errors/fields-not-consented",
+    title="Holder did not consent to field",
+    detail="Presentation attempts to disclose fields outside holder consent.",
 )
-def submit_presentation(payload: VerificationSubmission) -> RiskInsightResponse:
-    session = store.get_verification_session(payload.session_id)
-    if not session or not session.is_active():
-        _raise_problem(
-            status=410,
-            type_="https://medssi.dev/errors/session-expired",
-            title="Verification session expired",
-            detail="Create a new QR code to verify credentials.",
-        )
 
-    credential = store.get_credential(payload.credential_id)
-    if not credential:
-        _raise_problem(
-            status=404,
-            type_="https://medssi.dev/errors/credential-not-found",
-            title="Credential not found",
-            detail="Holder credential not located.",
-        )
+
+def _presentation_problem(
+    session: Optional[VerificationSession],
+    credential: Optional[CredentialOffer],
+    payload: VerificationSubmission,
+    now: datetime,
+) -> Optional[Dict[str, Any]]:
+    """Return the first problem that rejects a presentation, or None if it may proceed."""
+    if session is None or not session.is_active(now):
+        return _PROBLEM_SESSION_EXPIRED
+    if credential is None:
+        return _PROBLEM_HOLDER_CREDENTIAL_NOT_FOUND
     if credential.status != CredentialStatus.ISSUED:
-        _raise_problem(
-            status=400,
-            type_="https://medssi.dev/errors/credential-not-issued",
-            title="Credential not issued",
-            detail="Only issued credentials may be presented.",
-        )
+        return _PROBLEM_PRESENTED_NOT_ISSUED
     if not credential.satisfies_ial(session.required_ial):
-        _raise_problem(
-            status=403,
-            type_="https://medssi.dev/errors/ial-mismatch",
-            title="Identity assurance insufficient",
-            detail="Credential assurance level below verifier minimum.",
-        )
+        return _PROBLEM_IAL_MISMATCH
     if credential.holder_did != payload.holder_did:
-        _raise_problem(
-            status=403,
-            type_="https://medssi.dev/errors/holder-mismatch",
-            title="Holder DID mismatch",
-            detail="Presentation holder does not match credential owner.",
-        )
+        return _PROBLEM_HOLDER_MISMATCH
+
+    # Key views compare against sets directly, so no per-request set is built.
+    session_fields = session.allowed_field_set()
+    requested_fields = payload.disclosed_fields.keys()
+    if not requested_fields <= session_fields:
+        return _PROBLEM_FIELDS_NOT_AUTHORIZED
+    if not requested_fields <= (credential.selected_disclosures.keys() or session_fields):
+        return _PROBLEM_FIELDS_NOT_CONSENTED
+    return None
 
-    session_fields = set(session.allowed_fields)
-    requested_fields = set(payload.disclosed_fields.keys())
-    if not requested_fields.issubset(session_fields):
-        _raise_problem(
-            status=400,
-            type_="https://medssi.dev/errors/fields-not-authorized",
-            title="Unauthorized disclosure field",
-            detail="Presentation includes fields outside session scope.",
-        )
 
-    selected_fields = set(credential.selected_disclosures.keys()) or session_fields
-    if not requested_fields.issubset(selected_fields):
-        _raise_problem(
-            status=400,
-            type_="https://medssi.dev/errors/fields-not-consented",
-            title="Holder did not consent to field",
-            detail="Presentation attempts to disclose fields outside holder consent.",
+@api_v2.post(
+    "/api/did/vp/result",
+    response_model=RiskInsightResponse,
+    dependencies=[Depends(require_verifier_token)],
+)
+def submit_presentation(payload: VerificationSubmission) -> Response:
+    now = utcnow()
+    session = store.get_verification_session(payload.session_id)
+    credential = store.get_credential(payload.credential_id)
+    problem = _presentation_problem(session, credential, payload, now)
+    if problem is not None:
+        raise HTTPException(status_code=problem["status"], detail=problem)
+
+    disclosed = payload.disclosed_fields
+    # disclosed_fields is validated as Dict[str, str], so values need no str() pass.
+    resolved_fields: Dict[str, str] = {
+        field: disclosed[field] for field in session.allowed_fields if field in disclosed
+    }
+    # Without a payload or alias fields nothing resolves, so nothing can mismatch.
+    if credential.payload is not None or credential.external_fields:
+        actual_values = _resolved_field_values(credential, resolved_fields)
+        mismatched = next(
+            (
+                field
+                for field, value in resolved_fields.items()
+                if actual_values[field] is not None and value != actual_values[field]
+            ),
+            None,
         )
+        if mismatched is not None:
+            _raise("value_mismatch", f"Field {mismatched} does not match credential contents.")
 
-    resolved_fields: Dict[str, str] = {}
-    for field in session.allowed_fields:
-        presented_value = payload.disclosed_fields.get(field)
-        if presented_value is None:
-            continue
-        actual_value = _resolve_field_value(credential, field)
-        if actual_value is not None and str(presented_value) != str(actual_value):
-            _raise_problem(
-                status=400,
-                type_="https://medssi.dev/errors/value-mismatch",
-                title="Disclosed value mismatch",
-                detail=f"Field {field} does not match credential contents.",
-            )
-        resolved_fields[field] = str(presented_value)
-
-    presentation = Presentation(
-        presentation_id=f"vp-{uuid.uuid4().hex}",
+    # Every field below comes from validated models, so skip re-validation.
+    presentation = Presentation.model_construct(
+        presentation_id=f"vp-{_hex_id()}",
         session_id=session.session_id,
         credential_id=credential.credential_id,
         holder_did=payload.holder_did,
         verifier_id=session.verifier_id,
         scope=session.scope,
         disclosed_fields=resolved_fields,
-        issued_at=datetime.utcnow(),
+        issued_at=now,
         nonce=credential.nonce,
     )
-    result = VerificationResult(
+    result = VerificationResult.model_construct(
         session_id=session.session_id,
         verifier_id=session.verifier_id,
         verified=True,
         presentation=presentation,
     )
-    store.persist_presentation(presentation)
-    store.persist_result(result)
+    store.persist_presentation_and_result(presentation, result)
+
+    insight = _RISK_ENGINE.evaluate(presentation, now.date())
+    return _json_response(
+        {"result": result.model_dump(mode="json"), "insight": insight.model_dump(mode="json")}
+    )
+
 
-    insight = get_risk_engine().evaluate(presentation)
-    return RiskInsightResponse(result=result, insight=insight)
+@api_v2.get(
+    "/api/did/vp/insight/{presentation_id}",
+    response_model=RiskInsight,
+    dependencies=[Depends(require_verifier_token)],
+)
+async def get_presentation_insight(presentation_id: str) -> Response:
+    presentation = store.get_presentation(presentation_id)
+    if presentation is None:
+        _raise("presentation_not_found", f"Presentation {presentation_id} does not exist.")
+    # Scoring against the presentation's own day reuses the cached submit-time result.
+    insight = _RISK_ENGINE.evaluate(presentation, presentation.issued_at.date())
+    return _json_response(insight.model_dump(mode="json"))
 
 
 @api_v2.delete(
     "/api/did/vp/session/{session_id}",
     dependencies=[Depends(require_verifier_token)],
 )
-def purge_session(session_id: str):
+def purge_session(session_id: str) -> Response:
     store.purge_session(session_id)
-    return {"session_id": session_id, "status": "PURGED"}
+    return _json_response({"session_id": session_id, "status": "PURGED"})
 
 
 @api_v2.post(
@@ -1589,9 +1970,12 @@ def purge_session(session_id: str):
     response_model=ResetResponse,
     dependencies=[Depends(require_any_sandbox_token)],
 )
-def reset_sandbox_state() -> ResetResponse:
+def reset_sandbox_state() -> Response:
     store.reset()
-    return ResetResponse(message="MedSSI in-memory store reset", timestamp=datetime.utcnow())
+    _clear_token_caches()
+    return _json_response(
+        {"message": "MedSSI in-memory store reset", "timestamp": _json_datetime(utcnow())}
+    )
 
 
 app.include_router(api_public)
@@ -1599,5 +1983,5 @@ app.include_router(api_v2)
 
 
 @app.get("/healthz")
-def healthcheck():
-    return {"status": "ok", "timestamp": datetime.utcnow().isoformat()}
+async def healthcheck() -> Response:
+    return _json_response({"status": "ok", "timestamp": _json_datetime(utcnow())})
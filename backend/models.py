@@ -1,11 +1,11 @@
 from __future__ import annotations
 
-from datetime import date, datetime
+from datetime import date, datetime, timezone
 from enum import Enum
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, FrozenSet, List, Optional
 from typing import Literal
 
-from pydantic import BaseModel, Field, root_validator
+from pydantic import BaseModel, Field, PrivateAttr, model_validator
 
 
 class IdentityAssuranceLevel(str, Enum):
@@ -39,6 +39,11 @@ def describe_ial(ial: IdentityAssuranceLevel) -> str:
     return IAL_DESCRIPTIONS[ial]
 
 
+def utcnow() -> datetime:
+    """Timezone-aware current UTC time; replaces the deprecated ``datetime.utcnow``."""
+    return datetime.now(timezone.utc)
+
+
 class FHIRCoding(BaseModel):
     system: str = Field(..., description="FHIR coding system URI")
     code: str = Field(..., description="Code value (e.g. ICD-10, ATC)")
@@ -158,8 +163,16 @@ class CredentialOffer(BaseModel):
     retention_expires_at: Optional[datetime] = None
     sealed_at: Optional[datetime] = None
 
-    @root_validator(pre=True)
-    def _ensure_ial_description(cls, values: Dict[str, Any]) -> Dict[str, Any]:
+    _allowed_fields: Optional[FrozenSet[str]] = PrivateAttr(default=None)
+    _allowed_fields_source: Optional[List[DisclosurePolicy]] = PrivateAttr(default=None)
+    _resolved_values: Dict[str, Optional[str]] = PrivateAttr(default_factory=dict)
+    _resolved_payload: Optional[CredentialPayload] = PrivateAttr(default=None)
+
+    @model_validator(mode="before")
+    @classmethod
+    def ensure_ial_description(cls, values: Any) -> Any:
+        if not isinstance(values, dict):
+            return values
         ial_value = values.get("ial")
         if ial_value is not None and "ial_description" not in values:
             if not isinstance(ial_value, IdentityAssuranceLevel):
@@ -168,12 +181,28 @@ class CredentialOffer(BaseModel):
         return values
 
     def is_active(self, as_of: Optional[datetime] = None) -> bool:
-        now = as_of or datetime.utcnow()
+        now = as_of or utcnow()
         return self.status not in {CredentialStatus.REVOKED, CredentialStatus.DECLINED} and now <= self.expires_at
 
     def satisfies_ial(self, required: IdentityAssuranceLevel) -> bool:
         return IAL_ORDER[self.ial] >= IAL_ORDER[required]
 
+    def allowed_disclosure_fields(self) -> FrozenSet[str]:
+        """All fields listed by the offer's policies, flattened once per policy list."""
+        if self._allowed_fields is None or self._allowed_fields_source is not self.disclosure_policies:
+            self._allowed_fields_source = self.disclosure_policies
+            self._allowed_fields = frozenset(
+                field for policy in self.disclosure_policies for field in policy.fields
+            )
+        return self._allowed_fields
+
+    def resolved_value_cache(self) -> Dict[str, Optional[str]]:
+        """Memo of resolved disclosure values, reset whenever the payload is replaced."""
+        if self._resolved_payload is not self.payload:
+            self._resolved_payload = self.payload
+            self._resolved_values = {}
+        return self._resolved_values
+
 
 class QRCodeResponse(BaseModel):
     credential: CredentialOffer
@@ -193,8 +222,11 @@ class NonceResponse(BaseModel):
     payload_available: bool
     payload_template: Optional[CredentialPayload] = None
 
-    @root_validator(pre=True)
-    def _ensure_nonce_ial(cls, values: Dict[str, Any]) -> Dict[str, Any]:
+    @model_validator(mode="before")
+    @classmethod
+    def ensure_nonce_ial(cls, values: Any) -> Any:
+        if not isinstance(values, dict):
+            return values
         ial_value = values.get("ial")
         if ial_value is not None and "ial_description" not in values:
             if not isinstance(ial_value, IdentityAssuranceLevel):
@@ -233,8 +265,13 @@ class VerificationSession(BaseModel):
     last_polled_at: datetime
     template_ref: Optional[str] = None
 
-    @root_validator(pre=True)
-    def _ensure_session_ial(cls, values: Dict[str, Any]) -> Dict[str, Any]:
+    _allowed_field_set: Optional[FrozenSet[str]] = PrivateAttr(default=None)
+
+    @model_validator(mode="before")
+    @classmethod
+    def ensure_session_ial(cls, values: Any) -> Any:
+        if not isinstance(values, dict):
+            return values
         ial_value = values.get("required_ial")
         if ial_value is not None and "ial_description" not in values:
             if not isinstance(ial_value, IdentityAssuranceLevel):
@@ -243,9 +280,15 @@ class VerificationSession(BaseModel):
         return values
 
     def is_active(self, as_of: Optional[datetime] = None) -> bool:
-        now = as_of or datetime.utcnow()
+        now = as_of or utcnow()
         return now <= self.expires_at
 
+    def allowed_field_set(self) -> FrozenSet[str]:
+        """The session's requested fields as a frozenset, built once and cached."""
+        if self._allowed_field_set is None:
+            self._allowed_field_set = frozenset(self.allowed_fields)
+        return self._allowed_field_set
+
 
 class VerificationCodeResponse(BaseModel):
     session: VerificationSession
@@ -1,7 +1,10 @@
 from __future__ import annotations
 
+import heapq
+import threading
+from contextlib import contextmanager
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Dict, Hashable, Iterator, List, Optional, Tuple
 
 from .models import (
     CredentialOffer,
@@ -11,60 +14,149 @@ from .models import (
     Presentation,
     VerificationResult,
     VerificationSession,
+    utcnow,
 )
 
 
 class InMemoryStore:
     """A tiny in-memory store for demo purposes."""
 
+    __slots__ = (
+        "_credential_lock",
+        "_session_lock",
+        "_credentials",
+        "_transaction_index",
+        "_holder_index",
+        "_credential_holders",
+        "_verification_sessions",
+        "_session_index",
+        "_verifier_index",
+        "_session_expiry",
+        "_presentations",
+        "_results",
+        "_session_presentations",
+        "_holder_presentations",
+        "_holder_results",
+    )
+
     def __init__(self) -> None:
+        # Single dict reads and writes are atomic under the GIL; the locks
+        # guard compound updates that keep a map and its indexes in step.
+        # _credential_lock covers credentials and their indexes;
+        # _session_lock covers sessions, presentations and results.
+        self._credential_lock = threading.RLock()
+        self._session_lock = threading.RLock()
         self._credentials: Dict[str, CredentialOffer] = {}
-        self._transaction_index: Dict[str, str] = {}
+        # transaction_id -> the stored credential itself, saving a second probe
+        self._transaction_index: Dict[str, CredentialOffer] = {}
+        # holder_did -> credential ids (dict used as an insertion-ordered set)
+        self._holder_index: Dict[str, Dict[str, None]] = {}
+        self._credential_holders: Dict[str, Optional[str]] = {}
         self._verification_sessions: Dict[str, VerificationSession] = {}
         self._session_index: Dict[str, str] = {}
+        # verifier_id -> session ids (dict used as an insertion-ordered set)
+        self._verifier_index: Dict[str, Dict[str, None]] = {}
+        # (expires_at, session_id) min-heap; entries for purged sessions are skipped lazily
+        self._session_expiry: List[Tuple[datetime, str]] = []
         self._presentations: Dict[str, Presentation] = {}
-        self._results: Dict[str, VerificationResult] = {}
+        # session_id -> presentation_id -> result
+        self._results: Dict[str, Dict[str, VerificationResult]] = {}
+        # session_id / holder_did -> presentation ids
+        self._session_presentations: Dict[str, Dict[str, None]] = {}
+        self._holder_presentations: Dict[str, Dict[str, None]] = {}
+        # holder_did -> (session_id, presentation_id) result keys
+        self._holder_results: Dict[str, Dict[Tuple[str, str], None]] = {}
 
     # Credential lifecycle -------------------------------------------------
     def persist_credential(self, credential: CredentialOffer) -> None:
-        self._credentials[credential.credential_id] = credential
-        self._transaction_index[credential.transaction_id] = credential.credential_id
+        with self._credential_lock:
+            self._credentials[credential.credential_id] = credential
+            self._transaction_index[credential.transaction_id] = credential
+            self._index_holder(credential)
 
     def get_credential(self, credential_id: str) -> Optional[CredentialOffer]:
         return self._credentials.get(credential_id)
 
     def get_credential_by_transaction(self, transaction_id: str) -> Optional[CredentialOffer]:
-        credential_id = self._transaction_index.get(transaction_id)
-        if not credential_id:
-            return None
-        return self._credentials.get(credential_id)
+        return self._transaction_index.get(transaction_id)
 
-    def update_credential(self, credential: CredentialOffer) -> None:
-        self._credentials[credential.credential_id] = credential
-        self._transaction_index[credential.transaction_id] = credential.credential_id
+    # Updates write the same maps and indexes as the initial persist.
+    update_credential = persist_credential
 
     def list_credentials_for_holder(self, holder_did: str) -> List[CredentialOffer]:
-        return [c for c in self._credentials.values() if c.holder_did == holder_did]
-
-    def revoke_credential(self, credential_id: str) -> None:
-        credential = self._credentials.get(credential_id)
-        if not credential:
-            raise KeyError(f"Unknown credential {credential_id}")
-        credential.status = CredentialStatus.REVOKED
-        credential.last_action_at = datetime.utcnow()
-        credential.retention_expires_at = credential.last_action_at
-        self.update_credential(credential)
-
-    def delete_credential(self, credential_id: str) -> None:
-        credential = self._credentials.pop(credential_id, None)
-        if credential:
-            self._transaction_index.pop(credential.transaction_id, None)
+        with self._credential_lock:
+            credential_ids = self._holder_index.get(holder_did, ())
+            return [self._credentials[credential_id] for credential_id in credential_ids]
+
+    @contextmanager
+    def edit_credential(self, credential_id: str) -> Iterator[Optional[CredentialOffer]]:
+        """Yield a stored credential (or None) under the credential lock and reindex it."""
+        with self._credential_lock:
+            credential = self._credentials.get(credential_id)
+            yield credential
+            # The stored object is mutated in place; only the holder can change.
+            if credential is not None:
+                self._index_holder(credential)
+
+    def revoke_credential(self, credential_id: str) -> CredentialOffer:
+        with self._credential_lock:
+            credential = self._credentials.get(credential_id)
+            if not credential:
+                raise KeyError(f"Unknown credential {credential_id}")
+            credential.status = CredentialStatus.REVOKED
+            credential.last_action_at = utcnow()
+            credential.retention_expires_at = credential.last_action_at
+            return credential
+
+    def delete_credential(self, credential_id: str) -> Optional[CredentialOffer]:
+        with self._credential_lock:
+            credential = self._credentials.pop(credential_id, None)
+            if credential:
+                self._transaction_index.pop(credential.transaction_id, None)
+                self._unindex_holder(credential_id)
+            return credential
+
+    def _index_holder(self, credential: CredentialOffer) -> None:
+        # Holder DIDs can be assigned when a wallet accepts an offer, so the
+        # previously indexed holder is tracked separately from the model.
+        credential_id = credential.credential_id
+        holder_did = credential.holder_did
+        if credential_id in self._credential_holders:
+            if self._credential_holders[credential_id] == holder_did:
+                return
+            self._unindex_holder(credential_id)
+        self._credential_holders[credential_id] = holder_did
+        if holder_did is not None:
+            self._add_to_index(self._holder_index, holder_did, credential_id)
+
+    def _unindex_holder(self, credential_id: str) -> None:
+        holder_did = self._credential_holders.pop(credential_id, None)
+        if holder_did is not None:
+            self._remove_from_index(self._holder_index, holder_did, credential_id)
+
+    @staticmethod
+    def _add_to_index(index: Dict[str, Dict[Hashable, None]], key: str, member: Hashable) -> None:
+        index.setdefault(key, {})[member] = None
+
+    @staticmethod
+    def _remove_from_index(
+        index: Dict[str, Dict[Hashable, None]], key: str, member: Hashable
+    ) -> None:
+        members = index.get(key)
+        if members is not None:
+            members.pop(member, None)
+            if not members:
+                del index[key]
 
     # Verification session lifecycle --------------------------------------
     def persist_verification_session(self, session: VerificationSession) -> None:
-        self._verification_sessions[session.session_id] = session
-        if session.transaction_id:
-            self._session_index[session.transaction_id] = session.session_id
+        with self._session_lock:
+            if session.session_id not in self._verification_sessions:
+                heapq.heappush(self._session_expiry, (session.expires_at, session.session_id))
+            self._verification_sessions[session.session_id] = session
+            if session.transaction_id:
+                self._session_index[session.transaction_id] = session.session_id
+            self._add_to_index(self._verifier_index, session.verifier_id, session.session_id)
 
     def get_verification_session(self, session_id: str) -> Optional[VerificationSession]:
         return self._verification_sessions.get(session_id)
@@ -78,79 +170,120 @@ class InMemoryStore:
         return self._verification_sessions.get(session_id)
 
     def list_active_sessions(self, verifier_id: Optional[str] = None) -> List[VerificationSession]:
-        now = datetime.utcnow()
-        return [
-            s
-            for s in self._verification_sessions.values()
-            if s.is_active(now) and (verifier_id is None or s.verifier_id == verifier_id)
-        ]
+        now = utcnow()
+        # Snapshot under the lock, filter outside it.
+        with self._session_lock:
+            if verifier_id is None:
+                sessions = list(self._verification_sessions.values())
+            else:
+                session_ids = self._verifier_index.get(verifier_id, ())
+                sessions = [self._verification_sessions[session_id] for session_id in session_ids]
+        return [s for s in sessions if s.is_active(now)]
 
     # Presentation lifecycle ----------------------------------------------
     def persist_presentation(self, presentation: Presentation) -> None:
-        self._presentations[presentation.presentation_id] = presentation
+        with self._session_lock:
+            presentation_id = presentation.presentation_id
+            self._presentations[presentation_id] = presentation
+            self._add_to_index(
+                self._session_presentations, presentation.session_id, presentation_id
+            )
+            self._add_to_index(
+                self._holder_presentations, presentation.holder_did, presentation_id
+            )
 
     def get_presentation(self, presentation_id: str) -> Optional[Presentation]:
         return self._presentations.get(presentation_id)
 
     def list_presentations_for_session(self, session_id: str) -> List[Presentation]:
-        return [p for p in self._presentations.values() if p.session_id == session_id]
+        with self._session_lock:
+            presentation_ids = self._session_presentations.get(session_id, ())
+            return [self._presentations[presentation_id] for presentation_id in presentation_ids]
 
     def delete_presentation(self, presentation_id: str) -> None:
-        presentation = self._presentations.pop(presentation_id, None)
-        if presentation:
-            keys_to_remove = [
-                key for key in self._results if key.endswith(f":{presentation.presentation_id}")
-            ]
-            for key in keys_to_remove:
-                self._results.pop(key, None)
+        with self._session_lock:
+            presentation = self._presentations.pop(presentation_id, None)
+            if presentation:
+                self._remove_from_index(
+                    self._session_presentations, presentation.session_id, presentation_id
+                )
+                self._remove_from_index(
+                    self._holder_presentations, presentation.holder_did, presentation_id
+                )
+                self._drop_result(presentation.session_id, presentation_id)
 
     # Verification result cache -------------------------------------------
     def persist_result(self, result: VerificationResult) -> None:
-        key = f"{result.session_id}:{result.presentation.presentation_id}"
-        self._results[key] = result
+        session_id = result.session_id
+        presentation_id = result.presentation.presentation_id
+        with self._session_lock:
+            self._results.setdefault(session_id, {})[presentation_id] = result
+            self._add_to_index(
+                self._holder_results, result.presentation.holder_did, (session_id, presentation_id)
+            )
+
+    def persist_presentation_and_result(
+        self, presentation: Presentation, result: VerificationResult
+    ) -> None:
+        """Record a verified presentation and its result in one store call."""
+        with self._session_lock:
+            self.persist_presentation(presentation)
+            self.persist_result(result)
+
+    def _drop_result(self, session_id: str, presentation_id: str) -> Optional[VerificationResult]:
+        with self._session_lock:
+            session_results = self._results.get(session_id)
+            if not session_results:
+                return None
+            result = session_results.pop(presentation_id, None)
+            if not session_results:
+                del self._results[session_id]
+            if result is not None:
+                self._remove_from_index(
+                    self._holder_results,
+                    result.presentation.holder_did,
+                    (session_id, presentation_id),
+                )
+            return result
 
     def get_result(self, session_id: str, presentation_id: str) -> Optional[VerificationResult]:
-        key = f"{session_id}:{presentation_id}"
-        return self._results.get(key)
+        session_results = self._results.get(session_id)
+        return session_results.get(presentation_id) if session_results else None
 
     def latest_result_for_session(self, session_id: str) -> Optional[VerificationResult]:
-        candidates = [
-            result
-            for key, result in self._results.items()
-            if key.startswith(f"{session_id}:")
-        ]
-        if not candidates:
-            return None
-        candidates.sort(key=lambda res: res.presentation.issued_at, reverse=True)
-        return candidates[0]
+        with self._session_lock:
+            session_results = self._results.get(session_id)
+            if not session_results:
+                return None
+            results = list(session_results.values())
+        return max(results, key=lambda res: res.presentation.issued_at)
 
     # Forget / right-to-be-forgotten --------------------------------------
     def forget_holder(self, holder_did: str) -> ForgetSummary:
-        credential_ids = [
-            credential_id
-            for credential_id, credential in self._credentials.items()
-            if credential.holder_did == holder_did
-        ]
-        for credential_id in credential_ids:
-            credential = self._credentials.pop(credential_id, None)
-            if credential:
-                self._transaction_index.pop(credential.transaction_id, None)
-
-        presentations_to_remove = [
-            pid
-            for pid, presentation in self._presentations.items()
-            if presentation.holder_did == holder_did
-        ]
-        for pid in presentations_to_remove:
-            self.delete_presentation(pid)
-
-        results_to_remove = [
-            key
-            for key, result in self._results.items()
-            if result.presentation.holder_did == holder_did
-        ]
-        for key in results_to_remove:
-            self._results.pop(key, None)
+        # Each holder bucket is popped whole, so the per-id deletes below only
+        # clean up the remaining maps instead of unindexing one id at a time.
+        with self._credential_lock:
+            credential_ids = self._holder_index.pop(holder_did, {})
+            for credential_id in credential_ids:
+                self._credential_holders.pop(credential_id, None)
+                credential = self._credentials.pop(credential_id, None)
+                if credential is not None:
+                    self._transaction_index.pop(credential.transaction_id, None)
+
+        with self._session_lock:
+            presentations_to_remove = self._holder_presentations.pop(holder_did, {})
+            for pid in presentations_to_remove:
+                presentation = self._presentations.pop(pid, None)
+                if presentation is not None:
+                    self._remove_from_index(
+                        self._session_presentations, presentation.session_id, pid
+                    )
+                    self._drop_result(presentation.session_id, pid)
+
+            # Results still indexed here were not attached to a stored presentation.
+            results_to_remove = self._holder_results.pop(holder_did, {})
+            for session_id, presentation_id in results_to_remove:
+                self._drop_result(session_id, presentation_id)
 
         return ForgetSummary(
             holder_did=holder_did,
@@ -160,60 +293,89 @@ class InMemoryStore:
         )
 
     def purge_session(self, session_id: str) -> None:
-        session = self._verification_sessions.pop(session_id, None)
-        if session and session.transaction_id:
-            self._session_index.pop(session.transaction_id, None)
-        presentations_to_remove = [
-            pid
-            for pid, presentation in self._presentations.items()
-            if presentation.session_id == session_id
-        ]
-        for pid in presentations_to_remove:
-            self.delete_presentation(pid)
-        keys_to_remove = [key for key in self._results if key.startswith(f"{session_id}:")]
-        for key in keys_to_remove:
-            self._results.pop(key, None)
+        with self._session_lock:
+            session = self._verification_sessions.pop(session_id, None)
+            if session and session.transaction_id:
+                self._session_index.pop(session.transaction_id, None)
+            if session:
+                self._remove_from_index(self._verifier_index, session.verifier_id, session_id)
+            for pid in list(self._session_presentations.get(session_id, ())):
+                self.delete_presentation(pid)
+            for presentation_id, result in self._results.pop(session_id, {}).items():
+                self._remove_from_index(
+                    self._holder_results,
+                    result.presentation.holder_did,
+                    (session_id, presentation_id),
+                )
 
     # Housekeeping ---------------------------------------------------------
+    def _is_stored(self, credential: CredentialOffer) -> bool:
+        return self._credentials.get(credential.credential_id) is credential
+
     def cleanup_expired(self, now: Optional[datetime] = None) -> None:
-        reference = now or datetime.utcnow()
-
-        # Expire credential offers that were never accepted
-        expired_offers = [
-            credential_id
-            for credential_id, credential in self._credentials.items()
-            if credential.status == CredentialStatus.OFFERED
-            and reference > credential.expires_at
-        ]
-        for credential_id in expired_offers:
-            self.delete_credential(credential_id)
+        # Scans iterate over snapshots taken under the lock so request threads
+        # are not held up while a cleanup pass runs in the background.
+        reference = now or utcnow()
+        with self._credential_lock:
+            credentials = list(self._credentials.values())
+
+        # Expire credential offers that were never accepted. Each candidate is
+        # rechecked under the lock: it may have been accepted, forgotten or
+        # deleted since the snapshot was taken.
+        for credential in credentials:
+            if credential.status != CredentialStatus.OFFERED or reference <= credential.expires_at:
+                continue
+            with self._credential_lock:
+                if self._is_stored(credential) and credential.status == CredentialStatus.OFFERED:
+                    self.delete_credential(credential.credential_id)
 
         # Seal or remove issued credentials whose retention elapsed
-        for credential in list(self._credentials.values()):
+        for credential in credentials:
             if credential.status != CredentialStatus.ISSUED:
                 continue
-            if credential.retention_expires_at and reference > credential.retention_expires_at:
+            if not credential.retention_expires_at or reference <= credential.retention_expires_at:
+                continue
+            with self._credential_lock:
+                if not self._is_stored(credential) or credential.status != CredentialStatus.ISSUED:
+                    continue
                 if credential.primary_scope == DisclosureScope.MEDICATION_PICKUP:
                     self.delete_credential(credential.credential_id)
-                    continue
-                if credential.payload is not None:
+                elif credential.payload is not None:
+                    # Sealed in place; re-persisting could resurrect a forgotten record.
                     credential.payload = None
                     credential.selected_disclosures.clear()
                     credential.sealed_at = reference
                     credential.last_action_at = reference
-                    self.update_credential(credential)
 
-        # Remove expired verification sessions
-        expired_sessions = [
-            session_id
-            for session_id, session in self._verification_sessions.items()
-            if not session.is_active(reference)
-        ]
-        for session_id in expired_sessions:
-            self.purge_session(session_id)
+        # Remove expired verification sessions, soonest expiry first. The lock
+        # is taken per session so request threads can interleave with a long pass.
+        expiry = self._session_expiry
+        while True:
+            with self._session_lock:
+                if not expiry or expiry[0][0] >= reference:
+                    break
+                _, session_id = heapq.heappop(expiry)
+                session = self._verification_sessions.get(session_id)
+                if session is not None and not session.is_active(reference):
+                    self.purge_session(session_id)
 
     def reset(self) -> None:
-        self.__init__()
+        # Clear in place under both locks; replacing the locks would let a
+        # thread already inside one keep mutating maps nobody else guards.
+        with self._credential_lock, self._session_lock:
+            self._credentials.clear()
+            self._transaction_index.clear()
+            self._holder_index.clear()
+            self._credential_holders.clear()
+            self._verification_sessions.clear()
+            self._session_index.clear()
+            self._verifier_index.clear()
+            self._session_expiry.clear()
+            self._presentations.clear()
+            self._results.clear()
+            self._session_presentations.clear()
+            self._holder_presentations.clear()
+            self._holder_results.clear()
 
 
 store = InMemoryStore()